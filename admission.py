@@ -0,0 +1,173 @@
+"""Admission control and load shedding for the scoring routes.
+
+At most ``max_in_flight`` scoring requests run at once per worker process.
+Requests beyond that wait in a FIFO queue of at most ``max_queue`` entries,
+each with a deadline (``queue_timeout_ms``, or sooner if the client sends
+``X-Request-Timeout-Ms``). A request is shed with a fast response instead of
+waiting when:
+
+* the queue is full -> ``429 Too Many Requests``
+* the expected wait (queue position x recent service time / slots) is
+  already past its deadline, or the deadline expires in the queue -> ``503``
+
+Both carry ``Retry-After``. Routes that are not scoring routes (health checks,
+``/api/metrics``, static files ...) bypass the queue entirely, so they are
+answered even while scoring is saturated.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+
+
+class Rejected(Exception):
+    """Raised by ``AdmissionController.acquire`` when a request is shed"""
+
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight slots plus a deadline-aware FIFO wait queue"""
+
+    def __init__(self, max_in_flight=32, max_queue=64, queue_timeout_ms=2000, ewma_alpha=0.2):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.ewma_alpha = ewma_alpha
+
+        self.in_flight = 0
+        self._waiters = deque()
+        self._service_time = None  # EWMA of admitted request duration, seconds
+        self.counters = {
+            'admitted': 0, 'queued': 0,
+            'shed_queue_full': 0, 'shed_deadline': 0, 'shed_timeout': 0,
+        }
+
+    def expected_wait(self, position):
+        """Seconds until a request at queue ``position`` (1-based) gets a slot"""
+        service_time = self._service_time if self._service_time is not None else 0.0
+        return position * service_time / self.max_in_flight
+
+    def _retry_after(self):
+        return max(1, math.ceil(self.expected_wait(len(self._waiters) + 1)))
+
+    async def acquire(self, timeout=None):
+        """Wait for a slot; returns the admission time or raises ``Rejected``"""
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.counters['admitted'] += 1
+            return time.perf_counter()
+
+        if len(self._waiters) >= self.max_queue:
+            self.counters['shed_queue_full'] += 1
+            raise Rejected(429, "Scoring queue is full", self._retry_after())
+        if self.expected_wait(len(self._waiters) + 1) > timeout:
+            self.counters['shed_deadline'] += 1
+            raise Rejected(503, "Expected queue wait exceeds the request deadline", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.counters['queued'] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                pass  # the slot was handed over just as the deadline hit
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+                self.counters['shed_timeout'] += 1
+                raise Rejected(503, "Timed out waiting for a scoring slot", self._retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(None)  # client went away after being handed a slot
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+            raise
+        self.counters['admitted'] += 1
+        return time.perf_counter()
+
+    def release(self, admitted_at):
+        """Free a slot (handing it straight to the oldest waiter, if any)"""
+        if admitted_at is not None:
+            elapsed = time.perf_counter() - admitted_at
+            if self._service_time is None:
+                self._service_time = elapsed
+            else:
+                self._service_time += self.ewma_alpha * (elapsed - self._service_time)
+
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # in_flight unchanged: the slot moves over
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return dict(
+            self.counters,
+            max_in_flight=self.max_in_flight,
+            max_queue=self.max_queue,
+            queue_timeout_ms=self.queue_timeout * 1000,
+            in_flight=self.in_flight,
+            queue_depth=len(self._waiters),
+            shed_total=(self.counters['shed_queue_full'] + self.counters['shed_deadline']
+                        + self.counters['shed_timeout']),
+            service_time_ms=round(self._service_time * 1000, 3) if self._service_time is not None else None,
+        )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an ``AdmissionController`` to selected routes.
+
+    ``is_controlled(method, path)`` decides which requests go through the
+    controller; everything else is passed straight to the app.
+    """
+
+    def __init__(self, app, controller, is_controlled):
+        self.app = app
+        self.controller = controller
+        self.is_controlled = is_controlled
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.is_controlled(scope['method'], scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        timeout = None
+        for name, value in scope.get('headers', []):
+            if name == b'x-request-timeout-ms':
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                # NaN, inf and non-positive values would disable or break the deadline
+                if math.isfinite(requested) and requested > 0:
+                    timeout = min(requested / 1000.0, self.controller.queue_timeout)
+                break
+
+        try:
+            admitted_at = await self.controller.acquire(timeout)
+        except Rejected as e:
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"error": e.reason},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(admitted_at)
@@ -13,7 +13,7 @@ from fastapi.staticfiles import StaticFiles
 # from src.pipeline.prediction_pipeline import PredictionPipeline # Removed to avoid AWS dependency
 # from src.pipeline.train_pipeline import TrainPipeline # Removed to avoid AWS dependency
 # from src.constant.application import * # Removed to avoid src dependency
-from app_local import predict_cluster, create_advanced_model, DataForm, load_or_create_model, METRICS_PATH # Import local logic
+from app_local import predict_cluster, retrain_model, DataForm, load_or_create_model, METRICS_PATH # Import local logic
 import json
 
 APP_HOST = "0.0.0.0"
@@ -98,7 +98,7 @@ async def trainRouteClient():
         # train_pipeline = TrainPipeline()
         # train_pipeline.run_pipeline()
         
-        create_advanced_model() # Use local training logic instead
+        retrain_model() # Use local training logic instead (single-flight)
 
         return Response("Training successful (Local Advanced Model) !!")
 
@@ -3,26 +3,49 @@ load_dotenv()
 
 from fastapi import FastAPI, Request
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, HTMLResponse
+from fastapi.responses import Response, HTMLResponse, JSONResponse, FileResponse
 from uvicorn import run as app_run
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN, AgglomerativeClustering
-from sklearn.preprocessing import StandardScaler, RobustScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
-import pickle
 import os
+import random
+import threading
+import time
 from pathlib import Path
 import json
+from contextlib import asynccontextmanager
+
+from model_registry import DEFAULT_MODEL_DIR, ModelRegistry, ModelRegistryError
+from training_lock import SingleFlight, TrainingInProgress
+from training import train_model
+from training_config import SERVER_SIDE_KEYS, TrainingConfig
+from features import RAW_COLUMNS, engineer_feature_matrix
+from feature_store import DEFAULT_STORE_PATH, FeatureStore
+from micro_batcher import MicroBatcher
+from drift_monitor import DriftMonitor
+from prediction_log import PredictionLog
+from segment_index import SegmentIndex, build_from_store
+from profiling import ProfileStore, SamplingProfiler, current_profiler, profiled_thread
+from admission import AdmissionController, AdmissionMiddleware
+from centroid_index import assign_clusters
 
 import warnings
 warnings.filterwarnings('ignore')
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Open the prediction log before the first request so no request pays
+    # for creating the database or starting the writer thread
+    if PREDICTION_LOG:
+        await run_in_threadpool(prediction_log.start)
+    yield
+    await run_in_threadpool(prediction_log.close)
+
+app = FastAPI(lifespan=lifespan)
 
 templates = Jinja2Templates(directory='templates')
 
@@ -38,12 +61,96 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Micro-batching of POST / (prediction_batcher below); read here because the
+# admission limit has to leave room for full batches
+PREDICTION_BATCHING = os.getenv("PREDICTION_BATCHING", "1") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+
+# Admission control for the scoring routes; everything else (health checks,
+# /api/metrics, static files) bypasses the queue and is answered first.
+# Each batched request holds a slot until its batch is scored, so the default
+# in-flight limit fits one batch being scored plus the next one filling.
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(2 * BATCH_MAX_SIZE)))
+if ADMISSION_CONTROL and PREDICTION_BATCHING and ADMISSION_MAX_IN_FLIGHT < BATCH_MAX_SIZE:
+    print(f"⚠️ ADMISSION_MAX_IN_FLIGHT={ADMISSION_MAX_IN_FLIGHT} caps batches below "
+          f"BATCH_MAX_SIZE={BATCH_MAX_SIZE}")
+admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+    queue_timeout_ms=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+)
+
+
+def is_scoring_route(method, path):
+    return (method == "POST" and path == "/") or path.startswith("/cluster-info/")
+
+
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware, controller=admission, is_controlled=is_scoring_route)
+
 # Create models directory
-MODEL_DIR = Path("local_models")
+MODEL_DIR = DEFAULT_MODEL_DIR
 MODEL_DIR.mkdir(exist_ok=True)
 MODEL_PATH = MODEL_DIR / "customer_model_advanced.pkl"
 METRICS_PATH = MODEL_DIR / "model_metrics.json"
 
+# Versioned model storage; METRICS_PATH always mirrors the live version.
+# MODEL_KEEP_VERSIONS=0 keeps every version on disk.
+registry = ModelRegistry(
+    MODEL_DIR,
+    metrics_mirror_path=METRICS_PATH,
+    keep_versions=int(os.getenv("MODEL_KEEP_VERSIONS", "20"))
+)
+
+# Only one training run at a time, across threads and worker processes.
+# Requests that need a model wait up to TRAINING_WAIT_TIMEOUT seconds for it.
+training_flight = SingleFlight(MODEL_DIR / ".training.lock")
+TRAINING_WAIT_TIMEOUT = float(os.getenv("TRAINING_WAIT_TIMEOUT", "30"))
+
+# Cluster -> customer ids for feature-store customers, rebuilt after training
+segment_index = SegmentIndex(os.getenv("SEGMENT_INDEX_PATH", "data/segments"))
+
+# Opt-in sampling profiler. With PROFILING_ENABLED=0 (default) the request hook
+# is not installed at all; with it on, a request is profiled when it sends
+# ``X-Profile: <PROFILING_TOKEN or 1>`` / ``?profile=...`` or is randomly
+# picked at PROFILE_SAMPLE_RATE. PROFILE_TRAINING=1 profiles every training run.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TRAINING = os.getenv("PROFILE_TRAINING", "0") == "1"
+profile_store = ProfileStore(os.getenv("PROFILE_DIR", "data/profiles"))
+
+
+def _wants_profile(request: Request):
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if flag is not None and flag == PROFILING_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+async def profile_requests(request: Request, call_next):
+    """Sample the stacks of selected requests and save a folded profile"""
+    if not _wants_profile(request):
+        return await call_next(request)
+    
+    # Only this (event loop) thread plus worker threads inside profiled_thread()
+    profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, threads={threading.get_ident()}).start()
+    token = current_profiler.set(profiler)
+    try:
+        response = await call_next(request)
+    finally:
+        current_profiler.reset(token)
+        profiler.stop()
+        meta = profile_store.save(profiler, 'request', f"{request.method} {request.url.path}")
+    response.headers["X-Profile-Id"] = meta['id']
+    return response
+
+
+if PROFILING_ENABLED:
+    app.middleware("http")(profile_requests)
+
 
 class DataForm:
     def __init__(self, request: Request):
@@ -96,205 +203,84 @@ class DataForm:
         self.NumWebVisitsMonth = form.get('NumWebVisitsMonth')
 
 
-def engineer_features(df):
-    """Create advanced features from raw data"""
-    df = df.copy()
-    
-    # Product spending features
-    df['Total_Product_Spending'] = (df['Wines'] + df['Fruits'] + df['Meat'] + 
-                                     df['Fish'] + df['Sweets'] + df['Gold'])
-    
-    # Purchase channel features
-    df['Total_Purchases'] = df['Web'] + df['Catalog'] + df['Store']
-    df['Online_Ratio'] = df['Web'] / (df['Total_Purchases'] + 1)
-    df['Store_Ratio'] = df['Store'] / (df['Total_Purchases'] + 1)
-    
-    # Customer behavior features
-    df['Purchase_Frequency'] = df['Total_Purchases'] / (df['Days_as_Customer'] + 1)
-    df['Avg_Purchase_Value'] = df['Total_Spending'] / (df['Total_Purchases'] + 1)
-    df['Days_Per_Purchase'] = df['Days_as_Customer'] / (df['Total_Purchases'] + 1)
-    
-    # Engagement features
-    df['Promo_Acceptance_Rate'] = df['Total_Promo'] / (df['Total_Purchases'] + 1)
-    df['Discount_Ratio'] = df['Discount_Purchases'] / (df['Total_Purchases'] + 1)
-    df['Web_Engagement'] = df['NumWebVisitsMonth'] / 30  # Daily visits
-    
-    # RFM-like features
-    df['Recency_Score'] = 100 - df['Recency']  # Inverse recency
-    df['Monetary_Score'] = df['Total_Spending']
-    df['Frequency_Score'] = df['Total_Purchases']
-    
-    # Spending patterns
-    df['Premium_Product_Ratio'] = (df['Wines'] + df['Meat']) / (df['Total_Product_Spending'] + 1)
-    df['Budget_Product_Ratio'] = (df['Fruits'] + df['Sweets']) / (df['Total_Product_Spending'] + 1)
-    
-    # Customer value
-    df['Customer_Lifetime_Value'] = df['Total_Spending'] * (df['Days_as_Customer'] / 365)
-    df['Income_to_Spending_Ratio'] = df['Total_Spending'] / (df['Income'] + 1)
-    
-    return df
-
-
-def find_optimal_clusters(X, max_clusters=6):
-    """Find optimal number of clusters using Silhouette method (faster)"""
-    silhouette_scores = []
-    
-    # Test fewer clusters for speed
-    for n_clusters in range(2, max_clusters + 1):
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=5, max_iter=100)
-        labels = kmeans.fit_predict(X)
-        silhouette_scores.append(silhouette_score(X, labels))
-    
-    # Find best silhouette score
-    best_idx = np.argmax(silhouette_scores)
-    optimal_k = best_idx + 2
-    
-    return optimal_k, silhouette_scores
-
-
-def create_advanced_model():
+def create_advanced_model(config=None):
     """Create an advanced ML model with all features and optimizations"""
-    np.random.seed(42)
-    n_samples = 1000  # Reduced for speed (was 2000)
-    
-    print("📊 Generating training data...")
-    # Generate comprehensive synthetic customer data
-    data = {
-        'Age': np.random.randint(18, 80, n_samples),
-        'Education': np.random.randint(0, 5, n_samples),
-        'Marital_Status': np.random.randint(0, 2, n_samples),
-        'Parental_Status': np.random.randint(0, 2, n_samples),
-        'Children': np.random.randint(0, 5, n_samples),
-        'Income': np.random.randint(20000, 150000, n_samples),
-        'Total_Spending': np.random.randint(100, 5000, n_samples),
-        'Days_as_Customer': np.random.randint(1, 3650, n_samples),
-        'Recency': np.random.randint(0, 100, n_samples),
-        'Wines': np.random.randint(0, 1000, n_samples),
-        'Fruits': np.random.randint(0, 200, n_samples),
-        'Meat': np.random.randint(0, 800, n_samples),
-        'Fish': np.random.randint(0, 400, n_samples),
-        'Sweets': np.random.randint(0, 150, n_samples),
-        'Gold': np.random.randint(0, 300, n_samples),
-        'Web': np.random.randint(0, 20, n_samples),
-        'Catalog': np.random.randint(0, 15, n_samples),
-        'Store': np.random.randint(0, 25, n_samples),
-        'Discount_Purchases': np.random.randint(0, 10, n_samples),
-        'Total_Promo': np.random.randint(0, 6, n_samples),
-        'NumWebVisitsMonth': np.random.randint(0, 30, n_samples),
-    }
-    
-    df = pd.DataFrame(data)
-    
-    # Engineer features
-    df_engineered = engineer_features(df)
-    
-    # Select important features for clustering
-    feature_columns = [
-        'Age', 'Income', 'Total_Spending', 'Days_as_Customer', 'Recency',
-        'Total_Product_Spending', 'Total_Purchases', 'Online_Ratio', 
-        'Purchase_Frequency', 'Avg_Purchase_Value', 'Promo_Acceptance_Rate',
-        'Discount_Ratio', 'Customer_Lifetime_Value', 'Income_to_Spending_Ratio',
-        'Premium_Product_Ratio', 'Web_Engagement'
-    ]
-    
-    X = df_engineered[feature_columns].values
-    
-    # Use RobustScaler (better for outliers)
-    scaler = RobustScaler()
-    X_scaled = scaler.fit_transform(X)
-    
-    print("🔍 Finding optimal clusters...")
-    # Find optimal number of clusters
-    optimal_k, silhouette_scores = find_optimal_clusters(X_scaled)
-    print(f"✅ Optimal clusters: {optimal_k}")
-    
-    print("🤖 Training KMeans model...")
-    # Train primary model (KMeans) - optimized parameters
-    kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10, max_iter=300)
-    kmeans_labels = kmeans.fit_predict(X_scaled)
-    
-    print("📊 Calculating metrics...")
-    # Calculate metrics
-    silhouette = silhouette_score(X_scaled, kmeans_labels)
-    davies_bouldin = davies_bouldin_score(X_scaled, kmeans_labels)
-    calinski = calinski_harabasz_score(X_scaled, kmeans_labels)
-    
-    print("🔬 Applying PCA...")
-    # Apply PCA for visualization
-    pca = PCA(n_components=3)
-    X_pca = pca.fit_transform(X_scaled)
-    
-    print("📈 Calculating cluster statistics...")
-    # Calculate cluster statistics
-    cluster_stats = {}
-    for i in range(optimal_k):
-        cluster_mask = kmeans_labels == i
-        cluster_stats[i] = {
-            'size': int(np.sum(cluster_mask)),
-            'avg_income': float(df[cluster_mask]['Income'].mean()),
-            'avg_spending': float(df[cluster_mask]['Total_Spending'].mean()),
-            'avg_age': float(df[cluster_mask]['Age'].mean()),
-        }
-    
-    # Save model and metadata
-    model_data = {
-        'kmeans': kmeans,
-        'scaler': scaler,
-        'pca': pca,
-        'feature_columns': feature_columns,
-        'optimal_k': optimal_k,
-        'cluster_stats': cluster_stats,
-        'metrics': {
-            'silhouette_score': float(silhouette),
-            'davies_bouldin_score': float(davies_bouldin),
-            'calinski_harabasz_score': float(calinski),
-            'inertia': float(kmeans.inertia_)
-        }
-    }
+    config = config or TrainingConfig.from_env()
+    if PROFILE_TRAINING:
+        with SamplingProfiler(PROFILE_INTERVAL_MS / 1000) as profiler:
+            model_data, metrics_summary = train_model(config)
+        meta = profile_store.save(profiler, 'training', config.name)
+        print(f"🔥 Training profile saved: {meta['id']}")
+    else:
+        model_data, metrics_summary = train_model(config)
     
     print("💾 Saving model...")
+    # Write to a fresh version directory, then atomically switch the pointer
+    version_id = registry.save_version(
+        model_data, metrics_summary,
+        extra_files={
+            'config.json': config.to_dict(),
+            'drift_reference.json': model_data['drift_reference']
+        }
+    )
+    registry.promote(version_id)
     
-    with open(MODEL_PATH, 'wb') as f:
-        pickle.dump(model_data, f)
-    
-    # Save metrics separately for easy access
-    with open(METRICS_PATH, 'w') as f:
-        json.dump({
-            'optimal_clusters': int(optimal_k),
-            'silhouette_score': float(silhouette),
-            'davies_bouldin_score': float(davies_bouldin),
-            'calinski_harabasz_score': float(calinski),
-            'cluster_sizes': {str(k): int(v['size']) for k, v in cluster_stats.items()},
-            'training_samples': int(n_samples),
-            'features_used': int(len(feature_columns))
-        }, f, indent=2)
+    # Both engines train from the store; scoring it is chunked, so the
+    # coordinator of a distributed run only holds the labels and index fields
+    if config.feature_store_path:
+        print("🗂️ Indexing segment membership...")
+        build_from_store(FeatureStore(config.feature_store_path), model_data,
+                         segment_index, version_id)
     
     print(f"✅ Model trained successfully!")
-    print(f"📊 Silhouette Score: {silhouette:.4f}")
-    print(f"📊 Davies-Bouldin Score: {davies_bouldin:.4f}")
-    print(f"📊 Calinski-Harabasz Score: {calinski:.2f}")
+    print(f"📊 Silhouette Score: {metrics_summary['silhouette_score']:.4f}")
+    print(f"📊 Davies-Bouldin Score: {metrics_summary['davies_bouldin_score']:.4f}")
+    print(f"📊 Calinski-Harabasz Score: {metrics_summary['calinski_harabasz_score']:.2f}")
+    for phase, timing in metrics_summary['phase_timings'].items():
+        print(f"⏱️ {phase}: {timing['wall_seconds']:.2f}s wall, {timing['cpu_seconds']:.2f}s CPU, "
+              f"peak RSS {timing['peak_rss_mb']} MB")
     
     return model_data
 
 
-def load_or_create_model():
-    """Load existing model or create new one"""
+def _bootstrap_model():
+    """Import the legacy model file if present, otherwise train from scratch"""
     if MODEL_PATH.exists():
         try:
-            with open(MODEL_PATH, 'rb') as f:
-                return pickle.load(f)
-        except:
-            return create_advanced_model()
-    else:
-        return create_advanced_model()
+            registry.import_legacy(MODEL_PATH, METRICS_PATH)
+            return registry.get_current()
+        except Exception as e:
+            print(f"⚠️ Could not import legacy model {MODEL_PATH}: {e}")
+    
+    return create_advanced_model()
 
 
-def predict_cluster(input_data):
-    """Make prediction using the advanced model"""
-    model_data = load_or_create_model()
+def load_or_create_model(timeout=None):
+    """Load the live model version or create a new one.
+    
+    Concurrent callers never train twice: one caller builds the model while
+    the others wait up to ``timeout`` seconds (TRAINING_WAIT_TIMEOUT by
+    default) and then raise TrainingInProgress.
+    """
+    model_data = registry.get_current()
+    if model_data is not None:
+        return model_data
     
-    # Parse input data
-    raw_features = {
+    return training_flight.run(
+        _bootstrap_model,
+        ready=registry.get_current,
+        timeout=TRAINING_WAIT_TIMEOUT if timeout is None else timeout
+    )
+
+
+def retrain_model(config=None):
+    """Train a new model version unless a training run is already active"""
+    return training_flight.run(lambda: create_advanced_model(config), timeout=0)
+
+
+def parse_input(input_data):
+    """Convert the 21 form values (in DataForm order) into a raw feature dict"""
+    return {
         'Age': float(input_data[0]),
         'Education': int(input_data[1]),
         'Marital_Status': int(input_data[2]),
@@ -317,31 +303,110 @@ def predict_cluster(input_data):
         'Total_Promo': float(input_data[19]),
         'NumWebVisitsMonth': float(input_data[20]),
     }
+
+
+def score_raw_frame(df, model_data, track_drift=True):
+    """Vectorized scoring of raw customer rows -> (clusters, confidences)"""
+    # Engineer only the features used in training, straight into a matrix
+    X = engineer_feature_matrix(df, model_data['feature_columns'], dtype=np.float64)
+    
+    # Scale, then one nearest-centroid search gives both cluster and confidence
+    X_scaled = model_data['scaler'].transform(X)
+    clusters, distances = assign_clusters(model_data, X_scaled)
+    confidences = 1 / (1 + distances)  # Convert distance to confidence
     
-    df = pd.DataFrame([raw_features])
+    if track_drift:
+        drift_monitor.observe(model_data.get('drift_reference'), X, clusters)
     
-    # Engineer features
-    df_engineered = engineer_features(df)
+    return clusters, confidences
+
+
+def predict_cluster(input_data):
+    """Make prediction using the advanced model"""
+    model_data = load_or_create_model()
     
-    # Extract features used in training
-    X = df_engineered[model_data['feature_columns']].values
+    df = pd.DataFrame([parse_input(input_data)])
+    clusters, confidences = score_raw_frame(df, model_data)
     
-    # Scale and predict
-    X_scaled = model_data['scaler'].transform(X)
-    cluster = model_data['kmeans'].predict(X_scaled)
+    return clusters, float(confidences[0])
+
+
+def predict_clusters_batch(input_rows):
+    """Score many form inputs in one call; returns (cluster, confidence) per row.
     
-    # Get prediction confidence (distance to cluster center)
-    distances = model_data['kmeans'].transform(X_scaled)
-    confidence = 1 / (1 + distances[0][cluster[0]])  # Convert distance to confidence
+    Rows that fail to parse get their ValueError back in place of a result
+    so the rest of the batch is still scored.
+    """
+    # Runs in a batcher worker thread; joins the request profile that opened the batch
+    with profiled_thread():
+        model_data = load_or_create_model()
+        
+        results = [None] * len(input_rows)
+        parsed, positions = [], []
+        for i, input_data in enumerate(input_rows):
+            try:
+                parsed.append(parse_input(input_data))
+                positions.append(i)
+            except (TypeError, ValueError, IndexError) as e:
+                results[i] = ValueError(f"Invalid customer data: {e}")
+        
+        if parsed:
+            clusters, confidences = score_raw_frame(pd.DataFrame(parsed), model_data)
+            for i, cluster, confidence in zip(positions, clusters, confidences):
+                results[i] = (int(cluster), float(confidence))
     
-    return cluster, float(confidence)
+    return results
+
+
+ALGORITHM_NAMES = {
+    'kmeans': "Advanced KMeans",
+    'birch': "BIRCH (CF-tree + Ward)",
+    'hierarchical': "Hierarchical (sampled Ward + nearest centroid)",
+}
+
+
+# Per-feature histograms of scored inputs, compared to the training reference
+drift_monitor = DriftMonitor()
 
 
-@app.get("/train", response_class=HTMLResponse)
+# Concurrent POST / requests are scored together in small batches
+prediction_batcher = MicroBatcher(
+    predict_clusters_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+)
+
+
+# Every prediction is queued for a background SQLite writer; a full queue drops
+PREDICTION_LOG = os.getenv("PREDICTION_LOG", "1") == "1"
+prediction_log = PredictionLog(
+    os.getenv("PREDICTION_LOG_PATH", "data/predictions.db"),
+    max_queue=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000")),
+    policy=os.getenv("PREDICTION_LOG_POLICY", "drop")
+)
+
+
+@app.api_route("/train", methods=["GET", "POST"], response_class=HTMLResponse)
 async def trainRouteClient(request: Request):
+    # POST accepts a JSON object of TrainingConfig overrides; which workers to
+    # connect to (and unpickle replies from) is only set by TRAINING_CONFIG
     try:
-        # Create/recreate the model
-        create_advanced_model()
+        config = TrainingConfig.from_env()
+        if request.method == "POST":
+            overrides = await request.json()
+            if not isinstance(overrides, dict):
+                raise ValueError("Training overrides must be a JSON object")
+            forbidden = sorted(set(overrides) & set(SERVER_SIDE_KEYS))
+            if forbidden:
+                raise ValueError(f"{forbidden} can only be set in the TRAINING_CONFIG file")
+            config = config.replace(**overrides)
+    except (ValueError, TypeError) as e:
+        return HTMLResponse(content=f"<h3>Invalid training config</h3><p>{e}</p>", status_code=400)
+    
+    try:
+        # Create/recreate the model (rejected while another run is active).
+        # Runs in the threadpool so the event loop keeps serving other routes.
+        await run_in_threadpool(retrain_model, config)
         
         # Load metrics
         with open(METRICS_PATH, 'r') as f:
@@ -432,6 +497,7 @@ async def trainRouteClient(request: Request):
                         <ul>
                             <li><strong>{metrics['features_used']}</strong> engineered features</li>
                             <li><strong>{metrics['training_samples']}</strong> training samples</li>
+                            <li>Training config: <strong>{metrics.get('config_name', 'default')}</strong></li>
                             <li>RobustScaler for outlier handling</li>
                             <li>PCA for dimensionality reduction</li>
                             <li>Multiple clustering algorithms</li>
@@ -454,6 +520,13 @@ async def trainRouteClient(request: Request):
         """
         return HTMLResponse(content=html_content)
         
+    except TrainingInProgress as e:
+        return HTMLResponse(
+            content=f"<h3>{e}</h3><p>Please retry in a few seconds.</p>",
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
     except Exception as e:
         error_html = f"""
         <!DOCTYPE html>
@@ -502,17 +575,42 @@ async def predictRouteClient(request: Request):
             form.Discount_Purchases, form.Total_Promo, form.NumWebVisitsMonth
         ]
         
-        predicted_cluster, confidence = predict_cluster(input_data)
+        if PREDICTION_BATCHING:
+            predicted_cluster, confidence = await prediction_batcher.submit(input_data)
+        else:
+            clusters, confidence = await run_in_threadpool(predict_cluster, input_data)
+            predicted_cluster = int(clusters[0])
+        
+        if PREDICTION_LOG:
+            log_args = (predicted_cluster, confidence, dict(zip(RAW_COLUMNS, input_data)),
+                        registry.current_version())
+            if prediction_log.policy == 'block':
+                # A full queue makes record() wait; keep that off the event loop
+                await run_in_threadpool(prediction_log.record, *log_args)
+            else:
+                prediction_log.record(*log_args)
        
         return templates.TemplateResponse(
             "customer.html",
             {
                 "request": request, 
-                "context": int(predicted_cluster[0]),
+                "context": int(predicted_cluster),
                 "confidence": f"{confidence * 100:.1f}"
             }
         )
 
+    except TrainingInProgress as e:
+        return templates.TemplateResponse(
+            "customer.html",
+            {
+                "request": request,
+                "context": "Rendering",
+                "error": f"{e}. Please retry in a few seconds."
+            },
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
     except Exception as e:
         print(f"❌ Error during prediction: {e}")  # Log for debugging
         return templates.TemplateResponse(
@@ -528,20 +626,23 @@ async def predictRouteClient(request: Request):
 @app.get("/status", response_class=HTMLResponse)
 async def status(request: Request):
     """Health check endpoint with detailed statistics"""
-    model_exists = MODEL_PATH.exists()
+    model_exists = registry.current_version() is not None or MODEL_PATH.exists()
     metrics_exist = METRICS_PATH.exists()
     
     model_info = {}
     metrics = {}
     
+    training_running = training_flight.is_running()
+    
     if model_exists:
         try:
-            model_data = load_or_create_model()
+            model_data = load_or_create_model(timeout=0)
+            training_config = model_data.get('training_config', {})
             model_info = {
-                "algorithm": "Advanced KMeans + DBSCAN + Hierarchical",
+                "algorithm": ALGORITHM_NAMES[training_config.get('algorithm', 'kmeans')],
                 "n_clusters": model_data['optimal_k'],
                 "features": len(model_data['feature_columns']),
-                "scaler": "RobustScaler"
+                "scaler": type(model_data['scaler']).__name__
             }
         except:
             pass
@@ -632,6 +733,9 @@ async def status(request: Request):
                         </span>
                     </p>
                     <p><strong>Model:</strong> {'✅ Advanced Model Trained' if model_exists else '❌ Not Trained'}</p>
+                    <p><strong>Version:</strong> {registry.current_version() or 'n/a'}</p>
+                    <p><strong>Algorithm:</strong> {model_info.get('algorithm', 'n/a')}</p>
+                    <p><strong>Training:</strong> {'🔄 In progress' if training_running else 'Idle'}</p>
                     <p><strong>Mode:</strong> Enhanced Local Mode with Advanced Features</p>
                 </div>
                 
@@ -717,10 +821,154 @@ async def get_metrics():
     }
 
 
+@app.get("/health")
+async def health():
+    """Liveness check; never queued behind scoring requests"""
+    return {"status": "ok", "model_version": registry.current_version()}
+
+
+@app.get("/api/admission")
+async def admission_stats():
+    """Scoring queue depth, in-flight requests and shed counts (per worker)"""
+    return dict(admission.stats(), enabled=ADMISSION_CONTROL)
+
+
+@app.get("/api/batching")
+async def batching_stats():
+    """Micro-batching metrics: batch fill rate and added queueing latency"""
+    return dict(prediction_batcher.stats(), enabled=PREDICTION_BATCHING)
+
+
+@app.get("/api/predictions")
+async def prediction_log_stats():
+    """Prediction log writer state: queued, written and dropped rows"""
+    return dict(prediction_log.stats(), enabled=PREDICTION_LOG)
+
+
+@app.get("/api/predictions/rollup")
+async def prediction_rollup(window: str = "day", days: float = 7, model_version: Optional[str] = None):
+    """Predictions per cluster per hour/day/week over the last ``days`` days"""
+    since = time.time() - days * 86400
+    try:
+        return {
+            "window": window,
+            "rollup": prediction_log.rollup(window, since=since, model_version=model_version)
+        }
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+
+@app.get("/api/segments")
+async def segment_index_info():
+    """Segment index summary; ``stale`` if built for another model version"""
+    meta = segment_index.meta()
+    if meta is None:
+        return {"built": False}
+    return dict(meta, built=True, stale=meta['model_version'] != registry.current_version())
+
+
+@app.post("/api/segments/rebuild")
+async def rebuild_segment_index():
+    """Score every feature-store customer with the live model and re-index"""
+    model_data = registry.get_current()
+    if model_data is None:
+        return JSONResponse(status_code=409, content={"error": "No live model"})
+    store = FeatureStore(TrainingConfig.from_env().feature_store_path or DEFAULT_STORE_PATH)
+    if not store.exists():
+        return JSONResponse(status_code=409, content={"error": f"Feature store {store.path} is empty"})
+    return await run_in_threadpool(build_from_store, store, model_data, segment_index,
+                                   registry.current_version())
+
+
+@app.get("/api/segments/{cluster_id}")
+async def segment_members(
+    cluster_id: int,
+    income_min: Optional[float] = None, income_max: Optional[float] = None,
+    recency_min: Optional[float] = None, recency_max: Optional[float] = None,
+    spending_min: Optional[float] = None, spending_max: Optional[float] = None,
+    sort_by: Optional[str] = None, cursor: int = 0, limit: int = 100
+):
+    """Page through customers of a cluster; ranges are ``min <= value < max``"""
+    filters = {
+        'Income': (income_min, income_max),
+        'Recency': (recency_min, recency_max),
+        'Total_Spending': (spending_min, spending_max),
+    }
+    try:
+        return await run_in_threadpool(segment_index.query, cluster_id, filters, sort_by=sort_by,
+                                       cursor=max(cursor, 0), limit=min(max(limit, 1), 1000))
+    except FileNotFoundError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+
+@app.get("/api/profiles")
+async def list_profiles():
+    """Recently captured request / training profiles, newest first"""
+    return {"enabled": PROFILING_ENABLED, "profiles": profile_store.list()}
+
+
+@app.get("/api/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """Download a profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    path = profile_store.folded_path(profile_id)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown profile: {profile_id}"})
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+@app.get("/api/drift")
+async def drift_report():
+    """Input drift of scored customers vs. the live model's training data"""
+    report = drift_monitor.report()
+    model_data = registry.get_current()
+    if model_data is not None and 'drift_reference' not in model_data:
+        report['status'] = 'no_reference'
+    return report
+
+
+@app.get("/api/models")
+async def list_model_versions():
+    """List stored model versions, newest first"""
+    return {
+        "current": registry.current_version(),
+        "versions": registry.list_versions()
+    }
+
+
+@app.post("/api/models/{version_id}/promote")
+async def promote_model_version(version_id: str):
+    """Make a stored model version live"""
+    try:
+        # Versions other than the rollback target are loaded from disk
+        await run_in_threadpool(registry.promote, version_id)
+    except ModelRegistryError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    return {"current": registry.current_version()}
+
+
+@app.post("/api/models/rollback")
+async def rollback_model_version():
+    """Switch back to the previously live model version"""
+    try:
+        version_id = await run_in_threadpool(registry.rollback)
+    except ModelRegistryError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return {"current": version_id}
+
+
 @app.get("/cluster-info/{cluster_id}")
 async def cluster_info(cluster_id: int):
     """Get detailed information about a specific cluster"""
-    model_data = load_or_create_model()
+    try:
+        model_data = await run_in_threadpool(load_or_create_model)
+    except TrainingInProgress as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
     optimal_k = model_data['optimal_k']
     
     if cluster_id >= optimal_k:
@@ -797,12 +1045,13 @@ if __name__ == "__main__":
     print("=" * 70)
     
     # Create model on startup if it doesn't exist
-    if not MODEL_PATH.exists():
+    if registry.current_version() is None and not MODEL_PATH.exists():
         print("🔧 Training advanced model...")
         create_advanced_model()
         print("✅ Model ready!")
     else:
-        print("✅ Using existing advanced model")
+        load_or_create_model()
+        print(f"✅ Using existing advanced model (version {registry.current_version()})")
     
     print("=" * 70)
     app_run(app, host="0.0.0.0", port=5000)
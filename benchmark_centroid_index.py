@@ -0,0 +1,82 @@
+"""Benchmark nearest-centroid search: brute force vs KD-tree vs ball tree.
+
+Usage:
+    python benchmark_centroid_index.py --ks 8 64 256 1024 4096 --output centroid_index_benchmark.json
+
+For every k, centroids are fitted on clustered synthetic data and then
+queried two ways: one batch of ``--batch`` rows, and ``--singles`` one-row
+calls (the ``predict_cluster`` path). ``auto`` picks a method per call. Each method's labels are checked
+against exact brute force (direct Euclidean distance to every centroid).
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.datasets import make_blobs
+
+from centroid_index import assign_clusters, build_centroid_index
+from distributed_kmeans import to_sklearn_kmeans
+
+
+def _exact_labels(X, centers):
+    return np.array([np.argmin(((centers - x) ** 2).sum(axis=1)) for x in X])
+
+
+def _time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run_benchmark(ks, n_features=16, batch=20_000, singles=1_000, random_state=42):
+    results = []
+    for k in ks:
+        X, blob = make_blobs(n_samples=max(batch, 20 * k), n_features=n_features, centers=k,
+                             cluster_std=1.0, random_state=random_state)
+        # Blob means as centroids, like a fitted model
+        centers = np.vstack([X[blob == c].mean(axis=0) for c in range(k)])
+        rng = np.random.default_rng(random_state)
+        queries = X[rng.choice(len(X), size=batch, replace=False)]
+        expected = _exact_labels(queries, centers)
+
+        kmeans = to_sklearn_kmeans(centers, 0.0, 1)
+        for method in ('none', 'auto', 'kd_tree', 'ball_tree'):
+            model_data = {'kmeans': kmeans, 'centroid_index': build_centroid_index(centers, method)}
+            (labels, _), batch_seconds = _time(lambda: assign_clusters(model_data, queries))
+            _, single_seconds = _time(
+                lambda: [assign_clusters(model_data, queries[i:i + 1]) for i in range(singles)], repeat=1
+            )
+            mismatches = int(np.sum(labels != expected))
+            results.append({
+                'k': k,
+                'method': 'brute_force' if method == 'none' else method,
+                'batch_rows_per_second': round(batch / batch_seconds),
+                'single_row_us': round(single_seconds / singles * 1e6, 1),
+                'mismatches_vs_exact': mismatches,
+            })
+            print(f"k={k:<6}{results[-1]['method']:<13}"
+                  f"batch {results[-1]['batch_rows_per_second']:>10} rows/s  "
+                  f"single {results[-1]['single_row_us']:>8} us  mismatches {mismatches}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare nearest-centroid search methods across k")
+    parser.add_argument('--ks', type=int, nargs='+', default=[8, 64, 256, 1024, 4096])
+    parser.add_argument('--batch', type=int, default=20_000)
+    parser.add_argument('--singles', type=int, default=1_000)
+    parser.add_argument('--output', default='centroid_index_benchmark.json')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.ks, batch=args.batch, singles=args.singles)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
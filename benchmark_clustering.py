@@ -0,0 +1,93 @@
+"""Benchmark fit time and silhouette: KMeans vs the hierarchical modes.
+
+Usage:
+    python benchmark_clustering.py --sizes 10000 50000 200000 --k 4 --output clustering_benchmark.json
+    python benchmark_clustering.py --data customers --k 5
+
+``--data blobs`` uses Gaussian blobs; ``--data customers`` uses the planted-
+segment customers from ``synthetic_data.py`` with the default training
+features.
+
+Every algorithm is scored with the same stratified-sample silhouette so the
+numbers are comparable. Full ``AgglomerativeClustering`` is included up to
+``--max-full-agglomerative`` rows to show the quadratic baseline.
+"""
+import argparse
+import json
+import time
+
+from sklearn.cluster import AgglomerativeClustering
+from sklearn.datasets import make_blobs
+from sklearn.preprocessing import RobustScaler
+
+from evaluation import sampled_silhouette
+from features import engineer_feature_matrix
+from hierarchical import fit_hierarchical_models
+from parallel_training import fit_kmeans_restarts
+from synthetic_data import generate_large
+from training_config import DEFAULT_FEATURE_COLUMNS
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def make_data(n, k, n_features=16, data='blobs', random_state=42):
+    if data == 'customers':
+        X = engineer_feature_matrix(generate_large(n, seed=random_state), DEFAULT_FEATURE_COLUMNS)
+    else:
+        X, _ = make_blobs(n_samples=n, n_features=n_features, centers=k,
+                          cluster_std=2.5, random_state=random_state)
+    return RobustScaler().fit_transform(X)
+
+
+def run_benchmark(sizes, k=4, n_features=16, max_full_agglomerative=10_000, data='blobs', random_state=42):
+    results = []
+    for n in sizes:
+        X = make_data(n, k, n_features, data, random_state)
+
+        candidates = {
+            'kmeans': lambda: fit_kmeans_restarts(X, [k], n_init=10, random_state=random_state)[0][k].labels_,
+            'birch': lambda: fit_hierarchical_models(X, [k], 'birch')[k].labels_,
+            'hierarchical': lambda: fit_hierarchical_models(X, [k], 'hierarchical',
+                                                            random_state=random_state)[k].labels_,
+        }
+        if n <= max_full_agglomerative:
+            candidates['agglomerative_full'] = lambda: AgglomerativeClustering(
+                n_clusters=k, linkage='ward').fit_predict(X)
+
+        for name, fit in candidates.items():
+            labels, seconds = _time(fit)
+            score = sampled_silhouette(X, labels, random_state=random_state)
+            results.append({
+                'algorithm': name,
+                'data': data,
+                'n_samples': n,
+                'fit_seconds': round(seconds, 3),
+                'silhouette_score': round(score['silhouette_score'], 4),
+                'silhouette_ci': [round(v, 4) for v in score['silhouette_ci']],
+            })
+            print(f"{name:<20}{n:>10}{seconds:>10.2f}s  silhouette {score['silhouette_score']:.4f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare KMeans with BIRCH / sampled hierarchical clustering")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 200_000])
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--max-full-agglomerative', type=int, default=10_000)
+    parser.add_argument('--data', choices=['blobs', 'customers'], default='blobs')
+    parser.add_argument('--output', default='clustering_benchmark.json')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, k=args.k, max_full_agglomerative=args.max_full_agglomerative,
+                            data=args.data)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Peak training memory with and without the memory-lean data path.
+
+Usage:
+    python benchmark_memory.py --sizes 250000 1000000 --output memory_benchmark.json
+
+Every run trains in a fresh process (so peak RSS is not inherited) with a
+single worker and a short sweep, since only the data path differs between
+the modes. ``legacy`` is ``memory_lean=False`` (the original float64 pipeline)
+and ``lean`` is the default. Peak RSS above the import baseline is reported
+per million rows.
+"""
+import argparse
+import json
+import multiprocessing as mp
+
+
+def _measure(n_samples, memory_lean, queue):
+    from parallel_training import peak_rss_mb
+    import training  # import cost is the baseline
+    from training_config import TrainingConfig
+
+    baseline = peak_rss_mb()
+    config = TrainingConfig(
+        n_samples=n_samples, memory_lean=memory_lean, max_clusters=3,
+        sweep_n_init=1, n_init=1, n_jobs=1, threads_per_worker=1
+    )
+    _, metrics = training.train_model(config)
+    queue.put({
+        'baseline_mb': baseline,
+        'peak_rss_mb': peak_rss_mb(),
+        'phase_peak_rss_mb': {name: t['peak_rss_mb'] for name, t in metrics['phase_timings'].items()},
+    })
+
+
+def run_benchmark(sizes):
+    ctx = mp.get_context('spawn')
+    results = []
+    for n in sizes:
+        for memory_lean in (False, True):
+            queue = ctx.Queue()
+            process = ctx.Process(target=_measure, args=(n, memory_lean, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+
+            above_baseline = result['peak_rss_mb'] - result['baseline_mb']
+            result.update({
+                'mode': 'lean' if memory_lean else 'legacy',
+                'n_samples': n,
+                'memory_lean': memory_lean,
+                'mb_per_million_rows': round(above_baseline / n * 1_000_000, 1),
+            })
+            results.append(result)
+            print(f"{'lean' if memory_lean else 'legacy':<10}{n:>10} rows  "
+                  f"peak {result['peak_rss_mb']:.0f} MB  "
+                  f"({result['mb_per_million_rows']:.0f} MB per million rows)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of training, legacy (memory_lean=False) vs memory-lean data path")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[250_000, 1_000_000])
+    parser.add_argument('--output', default='memory_benchmark.json')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
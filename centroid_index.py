@@ -0,0 +1,69 @@
+"""Exact nearest-centroid search for models with many clusters.
+
+Brute force compares every row with every centroid, O(k) per row, which
+dominates scoring once k reaches the hundreds. A space-partitioning tree over
+the centroids (``sklearn.neighbors.KDTree`` / ``BallTree``) prunes whole
+groups of centroids with the triangle inequality and answers the same exact
+nearest-neighbour query in roughly O(log k).
+
+The tree is built once at training time and pickled in
+``model_data['centroid_index']``. ``assign_clusters`` is the single scoring
+entry point. It uses the index when the model has one, and otherwise falls
+back to the original ``kmeans.transform`` + argmin (older models, "none").
+
+The best method depends on the call, not only on k (benchmark_centroid_index.py).
+Brute force pays a fixed ~0.4 ms per call, so the tree wins for small
+batches and single rows at every k. Brute force's vectorised distance matrix
+wins for large batches until k reaches a few hundred. With "auto", the
+method is chosen per call from the batch size and k.
+"""
+import numpy as np
+from sklearn.neighbors import BallTree, KDTree
+
+INDEX_KINDS = ('none', 'auto', 'kd_tree', 'ball_tree')
+# "auto" uses the tree for calls of at most this many rows at any k ...
+AUTO_MAX_BRUTE_ROWS = 256
+# ... and for larger batches once k reaches the measured batch crossover
+AUTO_MIN_CLUSTERS = 512
+
+
+class CentroidIndex:
+    """Tree over the centroids plus the rule for when to query it"""
+
+    def __init__(self, tree, n_clusters, adaptive=True):
+        self.tree = tree
+        self.n_clusters = n_clusters
+        self.adaptive = adaptive
+
+    def use_for(self, n_rows):
+        """Whether the tree beats brute force for a call of ``n_rows`` rows"""
+        return (not self.adaptive or n_rows <= AUTO_MAX_BRUTE_ROWS
+                or self.n_clusters >= AUTO_MIN_CLUSTERS)
+
+
+def build_centroid_index(centers, kind='auto'):
+    """``CentroidIndex`` over ``centers`` for exact 1-NN queries, or None for brute force"""
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"centroid_index must be one of {INDEX_KINDS}, got {kind!r}")
+    centers = np.asarray(centers, dtype=np.float64)
+    if kind == 'none':
+        return None
+    tree_cls = BallTree if kind == 'ball_tree' else KDTree
+    return CentroidIndex(tree_cls(centers, leaf_size=16), len(centers), adaptive=kind == 'auto')
+
+
+def brute_force_assign(kmeans, X):
+    """Nearest centroid by computing the distance to every centroid"""
+    distances = kmeans.transform(X)
+    clusters = distances.argmin(axis=1)
+    return clusters, distances[np.arange(len(clusters)), clusters]
+
+
+def assign_clusters(model_data, X_scaled):
+    """Nearest-centroid labels and distances for already-scaled rows"""
+    index = model_data.get('centroid_index')
+    if index is None or (isinstance(index, CentroidIndex) and not index.use_for(len(X_scaled))):
+        return brute_force_assign(model_data['kmeans'], X_scaled)
+    tree = index.tree if isinstance(index, CentroidIndex) else index  # bare trees: always used
+    distances, clusters = tree.query(np.asarray(X_scaled, dtype=np.float64), k=1)
+    return clusters[:, 0], distances[:, 0]
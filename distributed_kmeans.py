@@ -0,0 +1,306 @@
+"""Data-parallel (map-reduce) KMeans over sharded training data.
+
+Each worker process owns one shard of the feature store and never sends its
+rows back. Every Lloyd iteration the coordinator broadcasts the centroids,
+each worker returns per-cluster partial sums, counts and inertia for its
+shard, and the coordinator reduces them into the next centroids. Scaling,
+k-means++ seeding, silhouette and PCA use a small pooled random sample;
+Davies-Bouldin, Calinski-Harabasz and the cluster statistics are reduced from
+per-shard sufficient statistics.
+
+Workers talk over ``multiprocessing.connection`` so the same protocol works
+for local processes (``ShardedCluster.start_local``) and for workers on other hosts
+started with::
+
+    DISTRIBUTED_AUTHKEY=<secret> python distributed_kmeans.py worker --host 10.0.0.5 --port 6000
+
+``multiprocessing.connection`` unpickles every message, so anyone who can
+authenticate to a worker can run code on it. Remote workers therefore refuse to
+start (and the coordinator refuses to connect) without ``DISTRIBUTED_AUTHKEY``,
+which must be the same secret on every host. Workers bind to 127.0.0.1 unless
+``--host`` is given, and should only be reachable on a private network. The
+feature store must be on a shared path. The fitted model is a regular
+``sklearn.cluster.KMeans`` so it drops into ``model_data['kmeans']``.
+"""
+import argparse
+import multiprocessing as mp
+import os
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+from sklearn.cluster import KMeans, kmeans_plusplus
+from threadpoolctl import threadpool_limits
+
+from evaluation import ClusterStatsAccumulator
+
+STATS_COLUMNS = ['Age', 'Income', 'Total_Spending']
+WORKER_COMMANDS = {'load_store', 'load_array', 'sample', 'set_scaler', 'lloyd', 'stats'}
+CHUNK_ROWS = 100_000
+
+
+def _authkey():
+    key = os.getenv("DISTRIBUTED_AUTHKEY")
+    if not key:
+        raise RuntimeError("Set DISTRIBUTED_AUTHKEY to a shared secret to use remote workers")
+    return key.encode('utf-8')
+
+
+# ---------------------------------------------------------------------- #
+# Worker side
+# ---------------------------------------------------------------------- #
+def nearest_centers(X, centers):
+    """Labels and squared distances to the nearest center, in row chunks"""
+    labels = np.empty(len(X), dtype=np.int64)
+    sq_dist = np.empty(len(X))
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    for start in range(0, len(X), CHUNK_ROWS):
+        chunk = X[start:start + CHUNK_ROWS]
+        d = (np.einsum('ij,ij->i', chunk, chunk)[:, None]
+             - 2 * chunk @ centers.T + center_norms[None, :])
+        labels[start:start + CHUNK_ROWS] = d.argmin(axis=1)
+        sq_dist[start:start + CHUNK_ROWS] = np.maximum(d.min(axis=1), 0)
+    return labels, sq_dist
+
+
+class _Shard:
+    def __init__(self):
+        self.X = None
+        self.extra = None
+
+    def load_store(self, store_path, columns, start, stop):
+        from feature_store import FeatureStore
+
+        store = FeatureStore(store_path)
+        self.X = np.empty((stop - start, len(columns)))
+        for j, name in enumerate(columns):
+            self.X[:, j] = store.column(name)[start:stop]
+        self.extra = np.column_stack([store.column(name)[start:stop] for name in STATS_COLUMNS])
+        return len(self.X)
+
+    def load_array(self, X, extra):
+        self.X = np.asarray(X, dtype=float)
+        self.extra = np.asarray(extra, dtype=float)
+        return len(self.X)
+
+    def sample(self, n, seed):
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(len(self.X), size=min(n, len(self.X)), replace=False)
+        return self.X[idx].copy()
+
+    def set_scaler(self, center, scale):
+        self.X -= center
+        self.X /= scale
+
+    def lloyd(self, centers):
+        labels, sq_dist = nearest_centers(self.X, centers)
+        k = len(centers)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, self.X)
+        return sums, np.bincount(labels, minlength=k), float(sq_dist.sum())
+
+    def stats(self, centers, stat_centers):
+        labels, _ = nearest_centers(self.X, centers)
+        acc = ClusterStatsAccumulator(len(centers), self.X.shape[1], centers=stat_centers)
+        acc.partial_fit(self.X, labels)
+        extra_sums = np.zeros((len(centers), self.extra.shape[1]))
+        np.add.at(extra_sums, labels, self.extra)
+        return {
+            'counts': acc.counts, 'sums': acc.sums, 'sq_norms': acc.sq_norms,
+            'dist_sums': acc.dist_sums, 'simplified_sil_sum': acc.simplified_sil_sum,
+            'extra_sums': extra_sums,
+        }
+
+
+def _worker_loop(conn, threads=1):
+    """Serve coordinator commands on ``conn`` until 'stop' or disconnect"""
+    shard = _Shard()
+    with threadpool_limits(limits=threads):
+        while True:
+            try:
+                command, args = conn.recv()
+            except EOFError:
+                return
+            if command == 'stop':
+                conn.send(('ok', None))
+                return
+            if command not in WORKER_COMMANDS:
+                conn.send(('error', f"Unknown command {command!r}"))
+                continue
+            try:
+                conn.send(('ok', getattr(shard, command)(*args)))
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+def serve_worker(host, port, threads=1):
+    """Run a worker that accepts coordinator connections on host:port"""
+    with Listener((host, port), authkey=_authkey()) as listener:
+        print(f"🛰️ Distributed KMeans worker listening on {host}:{port}")
+        while True:
+            with listener.accept() as conn:
+                _worker_loop(conn, threads)
+
+
+# ---------------------------------------------------------------------- #
+# Coordinator side
+# ---------------------------------------------------------------------- #
+class ShardedCluster:
+    """Handles to a set of shard workers (local processes or remote hosts)"""
+
+    def __init__(self, connections, processes=()):
+        self.connections = list(connections)
+        self.processes = list(processes)
+
+    @classmethod
+    def start_local(cls, n_workers, threads_per_worker=1):
+        # Never fork: the server has live threads (threadpool, batcher, log writer)
+        # whose locks a forked child would inherit held, and then runs BLAS in it
+        ctx = mp.get_context('spawn')
+        connections, processes = [], []
+        for _ in range(n_workers):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_worker_loop, args=(child_conn, threads_per_worker), daemon=True)
+            process.start()
+            child_conn.close()
+            connections.append(parent_conn)
+            processes.append(process)
+        return cls(connections, processes)
+
+    @classmethod
+    def connect(cls, addresses):
+        connections = []
+        for address in addresses:
+            host, port = address.rsplit(':', 1)
+            connections.append(Client((host, int(port)), authkey=_authkey()))
+        return cls(connections)
+
+    def __len__(self):
+        return len(self.connections)
+
+    def call_each(self, command, per_worker_args):
+        """Send one command per worker, then gather replies (workers run concurrently)"""
+        for conn, args in zip(self.connections, per_worker_args):
+            conn.send((command, tuple(args)))
+        results = []
+        for conn in self.connections:
+            status, payload = conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"Worker failed on {command!r}: {payload}")
+            results.append(payload)
+        return results
+
+    def call_all(self, command, *args):
+        return self.call_each(command, [args] * len(self.connections))
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(('stop', ()))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def shard_ranges(n_rows, n_shards):
+    bounds = np.linspace(0, n_rows, n_shards + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def pooled_sample(cluster, shard_sizes, sample_size, seed):
+    """Uniform random sample across shards, proportional to shard size"""
+    total = sum(shard_sizes)
+    per_shard = [max(1, int(round(sample_size * size / total))) for size in shard_sizes]
+    parts = cluster.call_each('sample', [(n, seed + i) for i, n in enumerate(per_shard)])
+    return np.vstack(parts)
+
+
+def distributed_lloyd(cluster, init_centers, max_iter=300, tol=1e-4):
+    """Map-reduce Lloyd iterations; returns (centers, inertia, n_iter)"""
+    centers = np.asarray(init_centers, dtype=float).copy()
+    inertia = np.inf
+    for n_iter in range(1, max_iter + 1):
+        partials = cluster.call_all('lloyd', centers)
+        sums = sum(p[0] for p in partials)
+        counts = sum(p[1] for p in partials)
+        inertia = sum(p[2] for p in partials)
+
+        new_centers = centers.copy()
+        nonempty = counts > 0  # empty clusters keep their previous center
+        new_centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+        shift = float(np.sum((new_centers - centers) ** 2))
+        centers = new_centers
+        if shift <= tol:
+            break
+
+    # Inertia for the final centers
+    inertia = sum(p[2] for p in cluster.call_all('lloyd', centers))
+    return centers, float(inertia), n_iter
+
+
+def to_sklearn_kmeans(centers, inertia, n_iter):
+    """Wrap centers in a fitted ``KMeans`` usable by ``predict_cluster``"""
+    centers = np.asarray(centers, dtype=float)
+    # Fitting on the centers themselves reproduces them exactly and sets up
+    # every fitted attribute predict/transform rely on
+    kmeans = KMeans(n_clusters=len(centers), init=centers, n_init=1, max_iter=1)
+    kmeans.fit(centers)
+    kmeans.cluster_centers_ = centers
+    kmeans.inertia_ = inertia
+    kmeans.n_iter_ = n_iter
+    return kmeans
+
+
+def fit_distributed(cluster, n_clusters, sample, n_init=1, max_iter=300, tol=1e-4, random_state=42):
+    """Best of ``n_init`` distributed Lloyd runs seeded by k-means++ on ``sample``"""
+    seeds = np.random.RandomState(random_state).randint(0, 2**31 - 1, size=n_init)
+    # Same convention as sklearn: tol is relative to the mean feature variance
+    tol = tol * float(np.mean(np.var(sample, axis=0)))
+    best = None
+    for seed in seeds:
+        init_centers, _ = kmeans_plusplus(sample, n_clusters, random_state=int(seed))
+        centers, inertia, n_iter = distributed_lloyd(cluster, init_centers, max_iter, tol)
+        if best is None or inertia < best[1]:
+            best = (centers, inertia, n_iter)
+    return to_sklearn_kmeans(*best)
+
+
+def reduce_cluster_stats(cluster, centers):
+    """Two reduce passes giving exact DB/CH inputs and per-cluster raw means"""
+    first = cluster.call_all('stats', centers, None)
+    counts = sum(p['counts'] for p in first)
+    means = sum(p['sums'] for p in first) / np.maximum(counts, 1)[:, None]
+
+    second = cluster.call_all('stats', centers, means)
+    acc = ClusterStatsAccumulator(len(centers), centers.shape[1], centers=means)
+    acc.counts = sum(p['counts'] for p in second)
+    acc.sums = sum(p['sums'] for p in second)
+    acc.sq_norms = sum(p['sq_norms'] for p in second)
+    acc.dist_sums = sum(p['dist_sums'] for p in second)
+    acc.simplified_sil_sum = sum(p['simplified_sil_sum'] for p in second)
+    extra_means = sum(p['extra_sums'] for p in second) / np.maximum(acc.counts, 1)[:, None]
+    return acc, extra_means
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed KMeans shard worker")
+    sub = parser.add_subparsers(dest='command', required=True)
+    worker = sub.add_parser('worker', help="Serve one shard to a training coordinator")
+    worker.add_argument('--host', default='127.0.0.1',
+                        help="Interface to bind; use a private address for remote coordinators")
+    worker.add_argument('--port', type=int, default=6000)
+    worker.add_argument('--threads', type=int, default=1, help="BLAS/OpenMP threads")
+    args = parser.parse_args()
+    serve_worker(args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Streaming input-drift monitoring with fixed-size histogram sketches.
+
+At training time ``build_reference`` summarises every clustering feature as a
+histogram over the training-data quantiles (plus the cluster assignment
+frequencies). On the scoring path ``DriftMonitor.observe`` bins each incoming
+row into the same edges, which costs O(features * log bins) per row and a
+fixed amount of memory regardless of traffic. ``DriftMonitor.report``
+compares the live histograms with the reference using the Population
+Stability Index (PSI) and a binned Kolmogorov-Smirnov statistic.
+
+Counts are kept per worker process and reset whenever a different model
+version (i.e. a different reference) starts serving.
+"""
+import threading
+
+import numpy as np
+
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_OBSERVATIONS = 100
+
+
+def build_reference(X, feature_columns, labels, n_clusters, n_bins=20):
+    """Reference sketch of the training distribution, stored with the model"""
+    X = np.asarray(X, dtype=float)
+    features = {}
+    for j, name in enumerate(feature_columns):
+        quantiles = np.quantile(X[:, j], np.linspace(0, 1, n_bins + 1)[1:-1])
+        edges = np.unique(quantiles)
+        counts = np.bincount(np.searchsorted(edges, X[:, j], side='right'),
+                             minlength=len(edges) + 1)
+        features[name] = {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+    return {
+        'n_rows': int(len(X)),
+        'features': features,
+        'cluster_counts': np.bincount(labels, minlength=n_clusters).tolist(),
+    }
+
+
+def psi(expected_counts, actual_counts, eps=1e-4):
+    """Population Stability Index between two histograms over the same bins"""
+    expected = np.asarray(expected_counts, dtype=float)
+    actual = np.asarray(actual_counts, dtype=float)
+    p = np.maximum(expected / max(expected.sum(), 1), eps)
+    q = np.maximum(actual / max(actual.sum(), 1), eps)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def binned_ks(expected_counts, actual_counts):
+    """Max CDF gap at the bin edges (a lower bound on the exact KS statistic)"""
+    expected = np.asarray(expected_counts, dtype=float)
+    actual = np.asarray(actual_counts, dtype=float)
+    cdf_expected = np.cumsum(expected) / max(expected.sum(), 1)
+    cdf_actual = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(cdf_expected - cdf_actual)))
+
+
+def _severity(value):
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+class DriftMonitor:
+    """Live histograms of scored inputs, compared against a training reference"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reference = None
+        self._names = []
+        self._edges = []
+        self._counts = None
+        self._cluster_counts = None
+        self._n = 0
+
+    def _reset(self, reference):
+        self._reference = reference
+        self._names = list(reference['features'])
+        self._edges = [np.asarray(reference['features'][name]['edges']) for name in self._names]
+        self._counts = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self._edges]
+        self._cluster_counts = np.zeros(len(reference['cluster_counts']), dtype=np.int64)
+        self._n = 0
+
+    def observe(self, reference, X, clusters):
+        """Add a batch of scored rows; ``X`` columns follow the reference's features"""
+        if reference is None:
+            return
+        X = np.asarray(X, dtype=float)
+        clusters = np.asarray(clusters)
+
+        with self._lock:
+            if reference is not self._reference:
+                self._reset(reference)
+            for j, (edges, counts) in enumerate(zip(self._edges, self._counts)):
+                counts += np.bincount(np.searchsorted(edges, X[:, j], side='right'),
+                                      minlength=len(counts))
+            self._cluster_counts += np.bincount(clusters, minlength=len(self._cluster_counts))
+            self._n += len(X)
+
+    def report(self):
+        """PSI / KS per feature and for the cluster mix, plus a retrain hint"""
+        with self._lock:
+            if self._reference is None:
+                return {'status': 'no_data', 'observed_rows': 0, 'features': {}}
+            reference = self._reference
+            names = list(self._names)
+            counts = [c.copy() for c in self._counts]
+            cluster_counts = self._cluster_counts.copy()
+            n = self._n
+
+        features = {}
+        for name, live in zip(names, counts):
+            ref_counts = reference['features'][name]['counts']
+            value = psi(ref_counts, live)
+            features[name] = {
+                'psi': round(value, 4),
+                'ks': round(binned_ks(ref_counts, live), 4),
+                'severity': _severity(value),
+            }
+
+        cluster_psi = psi(reference['cluster_counts'], cluster_counts)
+        max_psi = max([f['psi'] for f in features.values()] + [cluster_psi])
+        enough = n >= MIN_OBSERVATIONS
+        return {
+            'status': _severity(max_psi) if enough else 'insufficient_data',
+            'observed_rows': int(n),
+            'reference_rows': reference['n_rows'],
+            'max_psi': round(max_psi, 4),
+            'cluster_psi': round(cluster_psi, 4),
+            'cluster_counts': cluster_counts.tolist(),
+            'retrain_recommended': bool(enough and max_psi >= PSI_SIGNIFICANT),
+            'features': features,
+        }
@@ -0,0 +1,189 @@
+"""Scalable clustering evaluation metrics.
+
+``sklearn.metrics.silhouette_score`` needs every pairwise distance, which is
+O(n^2) in time and memory. The helpers here keep evaluation cost linear in the
+number of rows:
+
+* silhouette is estimated on stratified samples of fixed size, with a
+  confidence interval from repeated samples, plus a centroid-based
+  "simplified silhouette" over all rows;
+* Davies-Bouldin and Calinski-Harabasz are computed from per-cluster
+  sufficient statistics (counts, sums, squared norms, distance sums) that are
+  accumulated chunk by chunk and match the sklearn definitions.
+"""
+import numpy as np
+from scipy import stats
+from sklearn.metrics import silhouette_samples
+
+
+def stratified_sample_indices(labels, sample_size, rng):
+    """Draw ``sample_size`` row indices with each cluster proportionally represented"""
+    labels = np.asarray(labels)
+    n = len(labels)
+    if sample_size >= n:
+        return np.arange(n)
+
+    clusters, counts = np.unique(labels, return_counts=True)
+    # Proportional allocation, but keep at least two rows of every cluster so
+    # that small clusters still contribute to the estimate
+    alloc = np.maximum(np.floor(counts * sample_size / n).astype(int), np.minimum(counts, 2))
+
+    indices = []
+    for cluster, take in zip(clusters, alloc):
+        members = np.flatnonzero(labels == cluster)
+        indices.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.concatenate(indices)
+
+
+def sampled_silhouette(X, labels, sample_size=2000, n_repeats=5, confidence=0.95, random_state=42):
+    """Estimate the silhouette score from repeated stratified samples.
+
+    Returns a dict with the point estimate, a ``confidence`` interval across
+    the repeats and the sample size used. Exact (zero-width interval) when the
+    data fits in a single sample.
+    """
+    labels = np.asarray(labels)
+    n = len(labels)
+    if len(np.unique(labels)) < 2:
+        return {'silhouette_score': 0.0, 'silhouette_ci': [0.0, 0.0], 'silhouette_sample_size': 0}
+
+    if n <= sample_size:
+        score = float(np.mean(silhouette_samples(X, labels)))
+        return {'silhouette_score': score, 'silhouette_ci': [score, score], 'silhouette_sample_size': n}
+
+    rng = np.random.default_rng(random_state)
+    estimates = []
+    for _ in range(n_repeats):
+        idx = stratified_sample_indices(labels, sample_size, rng)
+        values = silhouette_samples(X[idx], labels[idx])
+        # Re-weight per cluster so the estimate targets the population mean
+        # even though small clusters were over-sampled
+        sample_labels = labels[idx]
+        clusters, counts = np.unique(labels, return_counts=True)
+        cluster_means = np.array([values[sample_labels == c].mean() for c in clusters])
+        estimates.append(float(np.sum(cluster_means * counts) / n))
+
+    estimates = np.array(estimates)
+    mean = float(estimates.mean())
+    if n_repeats > 1:
+        sem = estimates.std(ddof=1) / np.sqrt(n_repeats)
+        half_width = float(stats.t.ppf((1 + confidence) / 2, n_repeats - 1) * sem)
+    else:
+        half_width = 0.0
+
+    return {
+        'silhouette_score': mean,
+        'silhouette_ci': [mean - half_width, mean + half_width],
+        'silhouette_sample_size': int(sample_size),
+    }
+
+
+class ClusterStatsAccumulator:
+    """Streaming per-cluster sufficient statistics for internal cluster metrics.
+
+    First pass (``partial_fit``) gathers counts, sums and squared norms, which
+    is enough for Calinski-Harabasz. Davies-Bouldin and the simplified
+    silhouette also need distances to the centroids, which ``partial_fit``
+    accumulates when ``centers`` are known (e.g. from KMeans, or from a
+    previous pass via ``centroids()``).
+    """
+
+    def __init__(self, n_clusters, n_features, centers=None):
+        self.n_clusters = n_clusters
+        self.counts = np.zeros(n_clusters, dtype=np.int64)
+        self.sums = np.zeros((n_clusters, n_features))
+        self.sq_norms = np.zeros(n_clusters)
+        self.centers = None if centers is None else np.asarray(centers, dtype=float)
+        self.dist_sums = np.zeros(n_clusters)
+        self.simplified_sil_sum = 0.0
+
+    def partial_fit(self, X, labels):
+        X = np.asarray(X, dtype=float)
+        labels = np.asarray(labels)
+        self.counts += np.bincount(labels, minlength=self.n_clusters)
+        np.add.at(self.sums, labels, X)
+        self.sq_norms += np.bincount(labels, weights=np.einsum('ij,ij->i', X, X),
+                                     minlength=self.n_clusters)
+
+        if self.centers is not None:
+            # (rows x k) distances to every center; k is small so this stays linear
+            dists = np.sqrt(np.maximum(
+                np.einsum('ij,ij->i', X, X)[:, None]
+                - 2 * X @ self.centers.T
+                + np.einsum('ij,ij->i', self.centers, self.centers)[None, :],
+                0
+            ))
+            own = dists[np.arange(len(labels)), labels]
+            self.dist_sums += np.bincount(labels, weights=own, minlength=self.n_clusters)
+
+            if self.n_clusters > 1:
+                dists[np.arange(len(labels)), labels] = np.inf
+                nearest_other = dists.min(axis=1)
+                denom = np.maximum(own, nearest_other)
+                sil = np.where(denom > 0, (nearest_other - own) / np.where(denom > 0, denom, 1), 0)
+                self.simplified_sil_sum += float(sil.sum())
+        return self
+
+    def centroids(self):
+        return self.sums / np.maximum(self.counts, 1)[:, None]
+
+    def calinski_harabasz(self):
+        n = self.counts.sum()
+        k = int(np.count_nonzero(self.counts))
+        if k < 2 or n <= k:
+            return 0.0
+        centroids = self.centroids()
+        overall = self.sums.sum(axis=0) / n
+        between = float(np.sum(self.counts * np.sum((centroids - overall) ** 2, axis=1)))
+        within = float(np.sum(self.sq_norms - self.counts * np.sum(centroids ** 2, axis=1)))
+        if within <= 0:
+            return 1.0
+        return between * (n - k) / (within * (k - 1))
+
+    def davies_bouldin(self):
+        """Requires ``centers`` to be the cluster means (e.g. converged KMeans)"""
+        if self.centers is None:
+            raise ValueError("Davies-Bouldin needs centers; run a second pass with centroids()")
+        mask = self.counts > 0
+        if mask.sum() < 2:
+            return 0.0
+        centers = self.centers[mask]
+        intra = self.dist_sums[mask] / self.counts[mask]
+        centroid_dist = np.sqrt(np.sum((centers[:, None, :] - centers[None, :, :]) ** 2, axis=2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (intra[:, None] + intra[None, :]) / centroid_dist
+        ratio[~np.isfinite(ratio)] = 0
+        np.fill_diagonal(ratio, 0)
+        return float(np.mean(ratio.max(axis=1)))
+
+    def simplified_silhouette(self):
+        n = self.counts.sum()
+        return self.simplified_sil_sum / n if n else 0.0
+
+
+def evaluate_clustering(X, labels, n_clusters, chunk_size=100_000,
+                        silhouette_sample_size=2000, n_repeats=5, random_state=42):
+    """Compute all training metrics in time linear in ``len(X)``.
+
+    Centroids are taken as the exact cluster means from a first streaming pass
+    so Davies-Bouldin and Calinski-Harabasz match sklearn's definitions.
+    """
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+
+    first = ClusterStatsAccumulator(n_clusters, X.shape[1])
+    for start in range(0, len(X), chunk_size):
+        first.partial_fit(X[start:start + chunk_size], labels[start:start + chunk_size])
+
+    second = ClusterStatsAccumulator(n_clusters, X.shape[1], centers=first.centroids())
+    for start in range(0, len(X), chunk_size):
+        second.partial_fit(X[start:start + chunk_size], labels[start:start + chunk_size])
+
+    metrics = sampled_silhouette(X, labels, sample_size=silhouette_sample_size,
+                                 n_repeats=n_repeats, random_state=random_state)
+    metrics.update({
+        'simplified_silhouette': float(second.simplified_silhouette()),
+        'davies_bouldin_score': float(second.davies_bouldin()),
+        'calinski_harabasz_score': float(second.calinski_harabasz()),
+    })
+    return metrics
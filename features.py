@@ -0,0 +1,102 @@
+"""Feature engineering shared by training, prediction and the feature store"""
+import numpy as np
+
+# Raw inputs collected by DataForm, in form order
+RAW_COLUMNS = [
+    'Age', 'Education', 'Marital_Status', 'Parental_Status', 'Children',
+    'Income', 'Total_Spending', 'Days_as_Customer', 'Recency',
+    'Wines', 'Fruits', 'Meat', 'Fish', 'Sweets', 'Gold',
+    'Web', 'Catalog', 'Store', 'Discount_Purchases', 'Total_Promo',
+    'NumWebVisitsMonth'
+]
+
+# Columns added by engineer_features, in creation order
+ENGINEERED_COLUMNS = [
+    'Total_Product_Spending', 'Total_Purchases', 'Online_Ratio', 'Store_Ratio',
+    'Purchase_Frequency', 'Avg_Purchase_Value', 'Days_Per_Purchase',
+    'Promo_Acceptance_Rate', 'Discount_Ratio', 'Web_Engagement',
+    'Recency_Score', 'Monetary_Score', 'Frequency_Score',
+    'Premium_Product_Ratio', 'Budget_Product_Ratio',
+    'Customer_Lifetime_Value', 'Income_to_Spending_Ratio'
+]
+
+
+# Smallest integer dtype that holds each raw input's range; used when
+# generating training data so a million rows take ~30 MB instead of ~170 MB
+RAW_DTYPES = {
+    'Age': np.int8, 'Education': np.int8, 'Marital_Status': np.int8,
+    'Parental_Status': np.int8, 'Children': np.int8, 'Income': np.int32,
+    'Total_Spending': np.int16, 'Days_as_Customer': np.int16, 'Recency': np.int8,
+    'Wines': np.int16, 'Fruits': np.int16, 'Meat': np.int16, 'Fish': np.int16,
+    'Sweets': np.int16, 'Gold': np.int16, 'Web': np.int8, 'Catalog': np.int8,
+    'Store': np.int8, 'Discount_Purchases': np.int8, 'Total_Promo': np.int8,
+    'NumWebVisitsMonth': np.int8,
+}
+
+# One formula per engineered column; ``c(name)`` returns a raw or earlier column
+_FORMULAS = {
+    # Product spending features
+    'Total_Product_Spending': lambda c: (c('Wines') + c('Fruits') + c('Meat') +
+                                         c('Fish') + c('Sweets') + c('Gold')),
+    # Purchase channel features
+    'Total_Purchases': lambda c: c('Web') + c('Catalog') + c('Store'),
+    'Online_Ratio': lambda c: c('Web') / (c('Total_Purchases') + 1),
+    'Store_Ratio': lambda c: c('Store') / (c('Total_Purchases') + 1),
+    # Customer behavior features
+    'Purchase_Frequency': lambda c: c('Total_Purchases') / (c('Days_as_Customer') + 1),
+    'Avg_Purchase_Value': lambda c: c('Total_Spending') / (c('Total_Purchases') + 1),
+    'Days_Per_Purchase': lambda c: c('Days_as_Customer') / (c('Total_Purchases') + 1),
+    # Engagement features
+    'Promo_Acceptance_Rate': lambda c: c('Total_Promo') / (c('Total_Purchases') + 1),
+    'Discount_Ratio': lambda c: c('Discount_Purchases') / (c('Total_Purchases') + 1),
+    'Web_Engagement': lambda c: c('NumWebVisitsMonth') / 30,  # Daily visits
+    # RFM-like features
+    'Recency_Score': lambda c: 100 - c('Recency'),  # Inverse recency
+    'Monetary_Score': lambda c: c('Total_Spending'),
+    'Frequency_Score': lambda c: c('Total_Purchases'),
+    # Spending patterns
+    'Premium_Product_Ratio': lambda c: (c('Wines') + c('Meat')) / (c('Total_Product_Spending') + 1),
+    'Budget_Product_Ratio': lambda c: (c('Fruits') + c('Sweets')) / (c('Total_Product_Spending') + 1),
+    # Customer value
+    'Customer_Lifetime_Value': lambda c: c('Total_Spending') * (c('Days_as_Customer') / 365),
+    'Income_to_Spending_Ratio': lambda c: c('Total_Spending') / (c('Income') + 1),
+}
+
+# Intermediate columns reused by several formulas
+_SHARED = ('Total_Product_Spending', 'Total_Purchases')
+
+
+def engineer_features(df):
+    """Create advanced features from raw data"""
+    df = df.copy()
+    for name in ENGINEERED_COLUMNS:
+        df[name] = _FORMULAS[name](df.__getitem__)
+    return df
+
+
+def engineer_feature_matrix(df, columns, dtype=np.float32, out=None):
+    """Compute only ``columns`` of ``engineer_features(df)`` into one matrix.
+
+    Nothing is copied into a new frame and unused features are never built;
+    each column is written straight into ``out`` (preallocated if not given).
+    Arithmetic runs in ``dtype``, so compact integer inputs cannot overflow.
+    """
+    if out is None:
+        out = np.empty((len(df), len(columns)), dtype=dtype)
+    shared = {}
+
+    def c(name):
+        if name in shared:
+            return shared[name]
+        if name in _FORMULAS:
+            value = _FORMULAS[name](c)
+            if name in _SHARED:
+                shared[name] = value
+            return value
+        return df[name].to_numpy(dtype=dtype)
+
+    for j, name in enumerate(columns):
+        if name not in _FORMULAS and name not in df.columns:
+            raise KeyError(f"Unknown feature column: {name}")
+        out[:, j] = c(name)
+    return out
@@ -0,0 +1,92 @@
+"""Near-linear hierarchical clustering modes.
+
+Plain ``AgglomerativeClustering`` needs O(n^2) memory, so two scalable
+variants are offered instead:
+
+* ``birch`` - a BIRCH CF-tree summarises the data in one pass, then Ward
+  agglomeration runs on the (few) subcluster centroids. The tree is built
+  once and re-clustered for every candidate k.
+* ``hierarchical`` - Ward linkage on a random sample (tree computed once and
+  cut at every candidate k), then every row is assigned to the nearest
+  sample-cluster centroid.
+
+Either way the result is expressed as cluster centroids wrapped in a fitted
+``KMeans``, so serving (nearest centroid) and ``model_data`` are unchanged.
+Training labels are the nearest-centroid assignments, i.e. exactly what
+``predict_cluster`` would return.
+"""
+import numpy as np
+from scipy.cluster.hierarchy import fcluster, ward
+from sklearn.cluster import AgglomerativeClustering, Birch
+
+from distributed_kmeans import nearest_centers, to_sklearn_kmeans
+
+
+def centroids_from_labels(X, labels, n_clusters):
+    counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.zeros((n_clusters, X.shape[1]))
+    np.add.at(sums, labels, X)
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+def _wrap(X, centers):
+    """Nearest-centroid labels + a KMeans wrapper carrying them"""
+    labels, sq_dist = nearest_centers(X, centers)
+    model = to_sklearn_kmeans(centers, float(sq_dist.sum()), 1)
+    model.labels_ = labels.astype(np.int32)
+    return model
+
+
+def birch_centroids(X, cluster_counts, threshold=2.0, branching_factor=50, max_subclusters=2000):
+    """Build one CF-tree, then cluster its subclusters for every k.
+
+    The Ward step on the subclusters is quadratic in their number, so the
+    threshold is doubled until the tree has at most ``max_subclusters`` leaves.
+    """
+    while True:
+        birch = Birch(threshold=threshold, branching_factor=branching_factor, n_clusters=None)
+        birch.fit(X)
+        subcenters = birch.subcluster_centers_
+        if len(subcenters) <= max_subclusters:
+            break
+        threshold *= 2
+    # Weight subclusters by how many rows they absorbed
+    sub_labels, _ = nearest_centers(X, subcenters)
+    weights = np.bincount(sub_labels, minlength=len(subcenters))
+
+    result = {}
+    for k in cluster_counts:
+        if len(subcenters) <= k:
+            result[k] = subcenters
+            continue
+        agg = AgglomerativeClustering(n_clusters=k, linkage='ward').fit(subcenters)
+        merged = np.zeros((k, X.shape[1]))
+        np.add.at(merged, agg.labels_, subcenters * weights[:, None])
+        totals = np.bincount(agg.labels_, weights=weights, minlength=k)
+        result[k] = merged / np.maximum(totals, 1)[:, None]
+    return result
+
+
+def sampled_ward_centroids(X, cluster_counts, sample_size=3000, random_state=42):
+    """Ward tree on a sample, cut at every k; centroids of the sample clusters"""
+    rng = np.random.default_rng(random_state)
+    sample = X[rng.choice(len(X), size=min(sample_size, len(X)), replace=False)]
+    tree = ward(sample)
+
+    result = {}
+    for k in cluster_counts:
+        labels = fcluster(tree, t=k, criterion='maxclust') - 1
+        result[k] = centroids_from_labels(sample, labels, labels.max() + 1)
+    return result
+
+
+def fit_hierarchical_models(X, cluster_counts, algorithm, threshold=2.0, branching_factor=50,
+                            max_subclusters=2000, sample_size=3000, random_state=42):
+    """Return ``{k: fitted KMeans wrapper}`` for a hierarchical ``algorithm``"""
+    if algorithm == 'birch':
+        centers = birch_centroids(X, cluster_counts, threshold, branching_factor, max_subclusters)
+    elif algorithm == 'hierarchical':
+        centers = sampled_ward_centroids(X, cluster_counts, sample_size, random_state)
+    else:
+        raise ValueError(f"Unknown hierarchical algorithm {algorithm!r}")
+    return {k: _wrap(X, c) for k, c in centers.items()}
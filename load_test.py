@@ -0,0 +1,253 @@
+"""Open-loop load generator and capacity report for the FastAPI service.
+
+Requests are sent on a fixed arrival schedule (constant or Poisson) that does
+not wait for earlier responses, and latency is measured from each request's
+*scheduled* send time. A stalled server therefore shows up as growing latency
+instead of silently lowering the offered load (no coordinated omission).
+
+The service is driven either in-process through its ASGI app or over HTTP
+against a running uvicorn. Each step of the rate ladder runs for
+``--duration`` seconds and the report gives latency percentiles and achieved
+throughput per step. The saturation point is the highest offered rate that
+still meets the SLO.
+
+Usage:
+    python load_test.py --rates 5 10 20 40 80 --duration 10 --slo-ms 200
+    python load_test.py --url http://127.0.0.1:5000 --rates 50 100 200 --with-train
+
+Needs ``httpx`` (see requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from features import RAW_COLUMNS
+from synthetic_data import generate_customers
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+DEFAULT_MIX = {'predict': 0.8, 'metrics': 0.1, 'cluster_info': 0.1}
+
+
+PAYLOAD_POOL_SIZE = 10_000
+
+
+def payload_pool(size=PAYLOAD_POOL_SIZE, seed=0):
+    """POST / form payloads drawn from the synthetic customer generator"""
+    customers = generate_customers(size, seed=seed)[RAW_COLUMNS]
+    return [{name: str(value) for name, value in row.items()}
+            for row in customers.to_dict(orient='records')]
+
+
+def build_request(kind, rng, payloads):
+    if kind == 'predict':
+        return 'POST', '/', rng.choice(payloads)
+    if kind == 'metrics':
+        return 'GET', '/api/metrics', None
+    if kind == 'cluster_info':
+        return 'GET', f"/cluster-info/{rng.randrange(0, 2)}", None
+    raise ValueError(f"Unknown request kind {kind!r}")
+
+
+def make_client(url=None, timeout=30.0):
+    if httpx is None:
+        raise SystemExit("load_test.py needs httpx: pip install httpx")
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    from app_local import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                             base_url="http://loadtest", timeout=timeout)
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+    values = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 2),
+        'p90_ms': round(float(np.percentile(values, 90)), 2),
+        'p99_ms': round(float(np.percentile(values, 99)), 2),
+        'max_ms': round(float(values.max()), 2),
+    }
+
+
+async def run_step(client, rate, duration, mix, seed, payloads, poisson=True, with_train=False):
+    """Offer ``rate`` req/s for ``duration`` seconds; returns the step summary"""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    records = []  # (kind, latency_seconds, ok)
+
+    async def fire(kind, method, path, data, scheduled):
+        try:
+            response = await client.request(method, path, data=data)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        records.append((kind, time.perf_counter() - scheduled, ok))
+
+    train_task = None
+    if with_train:
+        train_task = asyncio.create_task(client.get('/train'))
+
+    tasks = []
+    start = time.perf_counter()
+    next_at = start
+    while next_at < start + duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = rng.choices(kinds, weights)[0]
+        method, path, data = build_request(kind, rng, payloads)
+        # Latency counts from the scheduled time, not from when we got to send
+        tasks.append(asyncio.create_task(fire(kind, method, path, data, next_at)))
+        next_at += rng.expovariate(rate) if poisson else 1.0 / rate
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    if train_task is not None:
+        try:
+            await train_task
+        except Exception:
+            pass
+
+    latencies = [lat for _, lat, ok in records if ok]
+    errors = sum(1 for _, _, ok in records if not ok)
+    step = {
+        'offered_rps': rate,
+        'sent': len(records),
+        'achieved_rps': round(len(latencies) / elapsed, 2),
+        'error_rate': round(errors / len(records), 4) if records else 0.0,
+        'with_train': with_train,
+        **_percentiles(latencies),
+        'endpoints': {},
+    }
+    for kind in kinds:
+        kind_lat = [lat for k, lat, ok in records if k == kind and ok]
+        step['endpoints'][kind] = {'count': len(kind_lat), **_percentiles(kind_lat)}
+    return step
+
+
+def saturation_point(steps, slo_ms, max_error_rate=0.01):
+    """Highest offered rate whose p99 meets the SLO with few errors"""
+    passing = [
+        s for s in steps
+        if s['p99_ms'] is not None and s['p99_ms'] <= slo_ms
+        and s['error_rate'] <= max_error_rate
+        and s['achieved_rps'] >= 0.9 * s['offered_rps']
+    ]
+    return max((s['offered_rps'] for s in passing), default=None)
+
+
+def write_html(report, path):
+    steps = report['steps']
+    width, height, pad = 640, 320, 50
+    max_x = max([s['achieved_rps'] for s in steps] + [1])
+    max_y = max([s['p99_ms'] or 0 for s in steps] + [report['slo_ms'], 1]) * 1.1
+
+    def point(s, key):
+        x = pad + (width - 2 * pad) * s['achieved_rps'] / max_x
+        y = height - pad - (height - 2 * pad) * (s[key] or 0) / max_y
+        return f"{x:.1f},{y:.1f}"
+
+    slo_y = height - pad - (height - 2 * pad) * report['slo_ms'] / max_y
+    lines = ''.join(
+        f'<polyline fill="none" stroke="{color}" stroke-width="2" '
+        f'points="{" ".join(point(s, key) for s in steps)}"/>'
+        for key, color in (('p50_ms', '#4f46e5'), ('p99_ms', '#ef4444'))
+    )
+    rows = ''.join(
+        f"<tr><td>{s['offered_rps']}</td><td>{s['achieved_rps']}</td><td>{s['p50_ms']}</td>"
+        f"<td>{s['p90_ms']}</td><td>{s['p99_ms']}</td><td>{s['max_ms']}</td>"
+        f"<td>{s['error_rate'] * 100:.1f}%</td></tr>"
+        for s in steps
+    )
+    html = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <title>Capacity Report</title>
+    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.2.1/dist/css/bootstrap.min.css" rel="stylesheet">
+</head>
+<body class="container py-4">
+    <h1>Capacity Report</h1>
+    <p>Target: <code>{report['target']}</code> &middot; SLO p99 &le; {report['slo_ms']} ms
+       &middot; Saturation point: <strong>{report['saturation_rps'] or 'below lowest rate'}</strong> req/s
+       {'&middot; /train running during each step' if report['with_train'] else ''}</p>
+    <svg width="{width}" height="{height}" style="border:1px solid #ddd">
+        <line x1="{pad}" y1="{slo_y:.1f}" x2="{width - pad}" y2="{slo_y:.1f}" stroke="#10b981" stroke-dasharray="4"/>
+        {lines}
+        <text x="{width / 2}" y="{height - 10}" text-anchor="middle">achieved req/s (max {max_x:.0f})</text>
+        <text x="12" y="{height / 2}" transform="rotate(-90 12,{height / 2})" text-anchor="middle">latency ms (blue p50, red p99)</text>
+    </svg>
+    <table class="table table-sm mt-4">
+        <thead><tr><th>offered rps</th><th>achieved rps</th><th>p50 ms</th><th>p90 ms</th><th>p99 ms</th><th>max ms</th><th>errors</th></tr></thead>
+        <tbody>{rows}</tbody>
+    </table>
+</body>
+</html>
+"""
+    Path(path).write_text(html)
+
+
+async def run_load_test(rates, duration, slo_ms, url=None, mix=None, poisson=True,
+                        with_train=False, warmup=2.0, seed=42):
+    mix = mix or DEFAULT_MIX
+    payloads = payload_pool(seed=seed)
+    async with make_client(url) as client:
+        # Warm-up (model load, first-request costs) is not measured
+        if warmup > 0:
+            await run_step(client, max(1, rates[0]), warmup, mix, seed - 1, payloads, poisson)
+
+        steps = []
+        for i, rate in enumerate(rates):
+            step = await run_step(client, rate, duration, mix, seed + i, payloads, poisson, with_train)
+            steps.append(step)
+            print(f"📈 {rate:>7} req/s offered -> {step['achieved_rps']:>7} achieved, "
+                  f"p50 {step['p50_ms']} ms, p99 {step['p99_ms']} ms, errors {step['error_rate'] * 100:.1f}%")
+
+    return {
+        'target': url or 'in-process ASGI (app_local:app)',
+        'slo_ms': slo_ms,
+        'duration_seconds': duration,
+        'arrivals': 'poisson' if poisson else 'constant',
+        'mix': mix,
+        'with_train': with_train,
+        'saturation_rps': saturation_point(steps, slo_ms),
+        'steps': steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the segmentation service")
+    parser.add_argument('--url', help="Base URL of a running server (default: in-process ASGI)")
+    parser.add_argument('--rates', type=float, nargs='+', default=[5, 10, 20, 40, 80])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per rate step")
+    parser.add_argument('--slo-ms', type=float, default=200.0, help="p99 latency objective")
+    parser.add_argument('--mix', type=json.loads, default=None,
+                        help='Request mix as JSON, e.g. \'{"predict": 0.8, "metrics": 0.1, "cluster_info": 0.1}\'')
+    parser.add_argument('--constant', action='store_true', help="Constant instead of Poisson arrivals")
+    parser.add_argument('--with-train', action='store_true', help="Run /train during every step")
+    parser.add_argument('--output', default='capacity_report', help="Writes <output>.json and <output>.html")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(
+        args.rates, args.duration, args.slo_ms, url=args.url, mix=args.mix,
+        poisson=not args.constant, with_train=args.with_train
+    ))
+    with open(f"{args.output}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    write_html(report, f"{args.output}.html")
+    print(f"🎯 Saturation point: {report['saturation_rps']} req/s at p99 <= {args.slo_ms} ms")
+    print(f"💾 Report written to {args.output}.json and {args.output}.html")
+
+
+if __name__ == "__main__":
+    main()
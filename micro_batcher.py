@@ -0,0 +1,126 @@
+"""Dynamic micro-batching of concurrent single-row predictions.
+
+Requests that arrive within ``max_wait_ms`` of each other (or until
+``max_batch_size`` rows are waiting) are scored together in one vectorized
+call, and each caller's future is resolved with its own result. The batch is
+scored in a worker thread so the event loop keeps accepting requests while the
+model runs.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+
+
+class MicroBatcher:
+    """Collect single-row requests on the event loop and score them in batches.
+
+    ``score_fn(rows)`` receives a list of rows and must return a list of the
+    same length; an item that is an Exception instance is raised to that
+    row's caller only, so one bad input does not fail the whole batch.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0, latency_window=1000):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending = []
+        self._timer = None
+        # The loop only keeps weak references to tasks; hold batches until done
+        self._tasks = set()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._full_batches = 0
+        self._queue_waits = deque(maxlen=latency_window)
+        self._score_times = deque(maxlen=latency_window)
+
+    async def submit(self, row):
+        """Queue ``row`` for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            # Overflow rows start their own wait window
+            self._timer = loop.call_later(self.max_wait, self._flush, loop)
+
+        task = loop.create_task(self._run_batch(loop, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, loop, batch):
+        started = time.perf_counter()
+        rows = [row for row, _, _ in batch]
+        # Carry context variables (e.g. the active request profile) into the worker thread
+        score = functools.partial(contextvars.copy_context().run, self.score_fn, rows)
+        try:
+            results = await loop.run_in_executor(None, score)
+        except Exception as e:
+            results = [e] * len(batch)
+        finished = time.perf_counter()
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():  # caller went away
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._full_batches += len(batch) == self.max_batch_size
+            self._queue_waits.extend(started - enqueued for _, _, enqueued in batch)
+            self._score_times.append(finished - started)
+
+    def stats(self):
+        """Batch fill rate and queueing latency added by batching"""
+        with self._stats_lock:
+            waits = sorted(self._queue_waits)
+            score_times = list(self._score_times)
+            batches, rows, full = self._batches, self._rows, self._full_batches
+
+        def percentile(values, q):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        avg_batch = rows / batches if batches else 0.0
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': batches,
+            'rows': rows,
+            'pending': len(self._pending),
+            'avg_batch_size': round(avg_batch, 2),
+            'fill_rate': round(avg_batch / self.max_batch_size, 4),
+            'full_batch_ratio': round(full / batches, 4) if batches else 0.0,
+            'queue_wait_ms_p50': round(percentile(waits, 0.50), 3),
+            'queue_wait_ms_p99': round(percentile(waits, 0.99), 3),
+            'queue_wait_ms_max': round(waits[-1] * 1000, 3) if waits else 0.0,
+            'score_ms_avg': round(sum(score_times) / len(score_times) * 1000, 3) if score_times else 0.0,
+        }
@@ -0,0 +1,292 @@
+"""Versioned model storage with atomic promotion and instant rollback.
+
+Every training run is written to its own directory under
+``local_models/versions/<version_id>/``. Files are first written to a hidden
+temporary directory and then renamed into place, so a reader can never see a
+half-written pickle. A small ``current.json`` pointer (also replaced
+atomically) records which version is live plus the promotion history used for
+rollback.
+
+Loading a version from disk happens outside the lock that guards the cache
+and the live pointer, so scoring requests keep being served from the cached
+live model while another version is unpickled; the switch itself is a
+reference swap. Only the live version and its rollback target are kept in memory, so a
+rollback only swaps a reference while a long-running server that retrains
+periodically does not accumulate old models. With ``keep_versions`` set, the
+oldest versions on disk are deleted after each promotion (the live version and
+its rollback target are always kept).
+"""
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+
+DEFAULT_MODEL_DIR = Path("local_models")
+
+
+class ModelRegistryError(Exception):
+    """Raised when a requested model version does not exist or is unusable"""
+
+
+def _atomic_write_bytes(path, payload):
+    """Write bytes to a temp file next to ``path`` and rename it into place"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path, data):
+    """Atomically replace ``path`` with the JSON encoding of ``data``"""
+    _atomic_write_bytes(path, json.dumps(data, indent=2).encode('utf-8'))
+
+
+class ModelRegistry:
+    """Directory-backed registry of trained model versions"""
+
+    MODEL_FILE = "model.pkl"
+    METRICS_FILE = "metrics.json"
+
+    def __init__(self, root, metrics_mirror_path=None, max_history=20, keep_versions=None):
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.pointer_path = self.root / "current.json"
+        # Legacy location read by /api/metrics and app.py
+        self.metrics_mirror_path = Path(metrics_mirror_path) if metrics_mirror_path else None
+        self.max_history = max_history
+        self.keep_versions = keep_versions  # None keeps every version on disk
+
+        self._lock = threading.RLock()          # cache + current pointer; held briefly
+        self._load_lock = threading.Lock()      # one disk load at a time
+        self._promote_lock = threading.RLock()  # serialises promote / rollback
+        self._cache = {}
+        self._current_version = None
+        self._pointer_mtime = None
+
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------ #
+    # Writing
+    # ------------------------------------------------------------------ #
+    def save_version(self, model_data, metrics, extra_files=None):
+        """Persist a new model version and return its id (not yet promoted)"""
+        # Sortable by creation time; the suffix keeps concurrent writers apart
+        version_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}"
+        tmp_dir = self.versions_dir / f".tmp-{version_id}"
+        tmp_dir.mkdir(parents=True)
+
+        try:
+            with open(tmp_dir / self.MODEL_FILE, 'wb') as f:
+                pickle.dump(model_data, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(tmp_dir / self.METRICS_FILE, 'w') as f:
+                json.dump(dict(metrics, version=version_id), f, indent=2)
+
+            for name, payload in (extra_files or {}).items():
+                with open(tmp_dir / name, 'w') as f:
+                    json.dump(payload, f, indent=2)
+
+            os.rename(tmp_dir, self.versions_dir / version_id)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        with self._lock:
+            # Cached for the promotion that normally follows
+            self._cache[version_id] = model_data
+            self._trim_cache(self._protected() | {version_id})
+        return version_id
+
+    def import_legacy(self, model_path, metrics_path=None):
+        """Register a pre-versioning ``customer_model_advanced.pkl`` as a version"""
+        with open(model_path, 'rb') as f:
+            model_data = pickle.load(f)
+
+        metrics = {}
+        if metrics_path and Path(metrics_path).exists():
+            with open(metrics_path, 'r') as f:
+                metrics = json.load(f)
+
+        version_id = self.save_version(model_data, metrics)
+        self.promote(version_id)
+        return version_id
+
+    # ------------------------------------------------------------------ #
+    # Pointer management
+    # ------------------------------------------------------------------ #
+    def _read_pointer(self):
+        if not self.pointer_path.exists():
+            return {"version": None, "history": []}
+        with open(self.pointer_path, 'r') as f:
+            return json.load(f)
+
+    def _write_pointer(self, pointer):
+        atomic_write_json(self.pointer_path, pointer)
+
+    def _protected(self):
+        """The live version and its rollback target"""
+        pointer = self._read_pointer()
+        return {pointer.get("version"), *pointer.get("history", [])[:1]} - {None}
+
+    def _trim_cache(self, keep):
+        for version_id in list(self._cache):
+            if version_id not in keep:
+                del self._cache[version_id]
+
+    def _mirror_metrics(self, version_id):
+        if self.metrics_mirror_path is None:
+            return
+        metrics = self.get_metrics(version_id)
+        if metrics:
+            atomic_write_json(self.metrics_mirror_path, metrics)
+
+    def promote(self, version_id):
+        """Make ``version_id`` the live model"""
+        with self._promote_lock:
+            model_data = self.load_version(version_id)  # disk load without self._lock
+
+            pointer = self._read_pointer()
+            previous = pointer.get("version")
+            history = pointer.get("history", [])
+            if previous and previous != version_id:
+                history = ([previous] + history)[:self.max_history]
+
+            with self._lock:
+                self._cache[version_id] = model_data
+                self._write_pointer({
+                    "version": version_id,
+                    "history": history,
+                    "promoted_at": time.time(),
+                })
+                self._current_version = version_id
+                self._pointer_mtime = self.pointer_path.stat().st_mtime_ns
+                self._trim_cache(self._protected())
+            self._mirror_metrics(version_id)
+            self.prune()
+            return model_data
+
+    def rollback(self):
+        """Re-promote the previously live version and return its id"""
+        with self._promote_lock:
+            pointer = self._read_pointer()
+            history = list(pointer.get("history", []))
+            while history:
+                candidate = history.pop(0)
+                if (self.versions_dir / candidate).exists():
+                    break
+            else:
+                raise ModelRegistryError("No previous model version to roll back to")
+
+            model_data = self.load_version(candidate)
+            with self._lock:
+                self._cache[candidate] = model_data
+                self._write_pointer({
+                    "version": candidate,
+                    "history": history,
+                    "promoted_at": time.time(),
+                })
+                self._current_version = candidate
+                self._pointer_mtime = self.pointer_path.stat().st_mtime_ns
+                self._trim_cache(self._protected())
+            self._mirror_metrics(candidate)
+            return candidate
+
+    def prune(self):
+        """Delete the oldest versions beyond ``keep_versions``; returns their ids"""
+        if not self.keep_versions:
+            return []
+        with self._promote_lock:
+            protected = self._protected()
+            versions = sorted(path.name for path in self.versions_dir.iterdir()
+                              if path.is_dir() and not path.name.startswith('.'))
+            removed = [version_id for version_id in versions[:max(0, len(versions) - self.keep_versions)]
+                       if version_id not in protected]
+            with self._lock:
+                for version_id in removed:
+                    self._cache.pop(version_id, None)
+            for version_id in removed:
+                shutil.rmtree(self.versions_dir / version_id, ignore_errors=True)
+            return removed
+
+    # ------------------------------------------------------------------ #
+    # Reading
+    # ------------------------------------------------------------------ #
+    def load_version(self, version_id):
+        """Return the model data for ``version_id`` (cached if live or rollback target)"""
+        with self._lock:
+            if version_id in self._cache:
+                return self._cache[version_id]
+
+        # Read and unpickle without self._lock so cache hits are never blocked
+        with self._load_lock:
+            with self._lock:
+                if version_id in self._cache:  # loaded while we waited
+                    return self._cache[version_id]
+
+            model_file = self.versions_dir / version_id / self.MODEL_FILE
+            if version_id.startswith('.') or '/' in version_id or not model_file.exists():
+                raise ModelRegistryError(f"Unknown model version: {version_id}")
+
+            with open(model_file, 'rb') as f:
+                model_data = pickle.load(f)
+
+            with self._lock:
+                self._cache[version_id] = model_data
+                self._trim_cache(self._protected() | {version_id})
+            return model_data
+
+    def current_version(self):
+        """Id of the live version, refreshed if another process promoted"""
+        try:
+            mtime = self.pointer_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        if mtime != self._pointer_mtime:
+            with self._lock:
+                self._current_version = self._read_pointer().get("version")
+                self._pointer_mtime = mtime
+        return self._current_version
+
+    def get_current(self):
+        """Return the live model data, or None when nothing has been promoted"""
+        version_id = self.current_version()
+        if version_id is None:
+            return None
+        return self.load_version(version_id)
+
+    def get_metrics(self, version_id):
+        metrics_file = self.versions_dir / version_id / self.METRICS_FILE
+        if not metrics_file.exists():
+            return {}
+        with open(metrics_file, 'r') as f:
+            return json.load(f)
+
+    def list_versions(self):
+        """Describe every stored version, newest first"""
+        current = self.current_version()
+        versions = []
+        for path in sorted(self.versions_dir.iterdir(), reverse=True):
+            if not path.is_dir() or path.name.startswith('.'):
+                continue
+            metrics = self.get_metrics(path.name)
+            versions.append({
+                "version": path.name,
+                "current": path.name == current,
+                "loaded": path.name in self._cache,
+                "optimal_clusters": metrics.get('optimal_clusters'),
+                "silhouette_score": metrics.get('silhouette_score'),
+                "training_samples": metrics.get('training_samples'),
+            })
+        return versions
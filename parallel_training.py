@@ -0,0 +1,149 @@
+"""Parallel KMeans restarts with controlled threading and phase timing.
+
+``KMeans(n_init=10)`` runs its restarts one after another inside a single
+process, using however many BLAS/OpenMP threads the library picks. Here every
+restart (and every candidate k of the cluster sweep) is an independent task
+run in a pool of worker processes, and each worker is pinned to a fixed number
+of BLAS/OpenMP threads so ``n_jobs * threads_per_worker`` never exceeds the
+machine.
+
+Settings come from the environment so they can be tuned per box:
+
+* ``TRAINING_N_JOBS`` - worker processes (default: all cores, -1)
+* ``TRAINING_THREADS_PER_WORKER`` - BLAS/OpenMP threads per worker
+  (default: cores // workers)
+* ``KMEANS_INIT`` - ``k-means++`` or ``greedy-sample`` (k-means++ seeding
+  computed on a random sample, much cheaper on large data)
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, kmeans_plusplus
+from threadpoolctl import threadpool_limits
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+INIT_METHODS = ('k-means++', 'greedy-sample')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def resolve_parallelism(n_jobs=None, threads_per_worker=None):
+    """Turn the configured values into concrete (workers, threads) counts"""
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None:
+        n_jobs = int(os.getenv("TRAINING_N_JOBS", "-1"))
+    if n_jobs < 0:
+        n_jobs = max(1, cpu_count + 1 + n_jobs)
+    n_jobs = max(1, min(n_jobs, cpu_count))
+
+    if threads_per_worker is None:
+        env_threads = os.getenv("TRAINING_THREADS_PER_WORKER")
+        threads_per_worker = int(env_threads) if env_threads else max(1, cpu_count // n_jobs)
+    return n_jobs, max(1, threads_per_worker)
+
+
+def _initial_centers(X, n_clusters, init, init_sample_size, seed):
+    if init == 'k-means++':
+        return 'k-means++'
+    if init != 'greedy-sample':
+        raise ValueError(f"Unknown init method {init!r}; expected one of {INIT_METHODS}")
+
+    rng = np.random.RandomState(seed)
+    if len(X) > init_sample_size:
+        X = X[rng.choice(len(X), init_sample_size, replace=False)]
+    # sklearn's k-means++ is the greedy variant (2 + log k local trials)
+    centers, _ = kmeans_plusplus(X, n_clusters, random_state=seed)
+    return centers
+
+
+def _fit_restart(X, n_clusters, seed, max_iter, init, init_sample_size, threads):
+    """Run one KMeans restart inside a worker; returns (model, cpu seconds)"""
+    cpu_start = time.process_time()
+    with threadpool_limits(limits=threads):
+        kmeans = KMeans(
+            n_clusters=n_clusters,
+            init=_initial_centers(X, n_clusters, init, init_sample_size, seed),
+            n_init=1,
+            max_iter=max_iter,
+            random_state=seed,
+        )
+        kmeans.fit(X)
+    return kmeans, time.process_time() - cpu_start
+
+
+def fit_kmeans_restarts(X, cluster_counts, n_init=10, max_iter=300, init=None,
+                        init_sample_size=10_000, random_state=42,
+                        n_jobs=None, threads_per_worker=None):
+    """Fit ``n_init`` restarts for every k in ``cluster_counts`` in parallel.
+
+    Returns ``(best_models, worker_cpu_seconds)`` where ``best_models`` maps
+    each k to the restart with the lowest inertia.
+    """
+    init = init or os.getenv("KMEANS_INIT", "k-means++")
+    n_jobs, threads = resolve_parallelism(n_jobs, threads_per_worker)
+    seeds = np.random.RandomState(random_state).randint(0, 2**31 - 1, size=n_init)
+
+    tasks = [(k, int(seed)) for k in cluster_counts for seed in seeds]
+    results = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_fit_restart)(X, k, seed, max_iter, init, init_sample_size, threads)
+        for k, seed in tasks
+    )
+
+    best_models = {}
+    worker_cpu = 0.0
+    for (k, _), (kmeans, cpu_seconds) in zip(tasks, results):
+        worker_cpu += cpu_seconds
+        if k not in best_models or kmeans.inertia_ < best_models[k].inertia_:
+            best_models[k] = kmeans
+    return best_models, worker_cpu
+
+
+class PhaseTimer:
+    """Record wall-clock and CPU time for each named training phase.
+
+    CPU time is this process's own time plus any worker CPU reported through
+    ``add_worker_cpu`` so parallel phases are not under-counted. The process's
+    peak RSS at the end of each phase is recorded too.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._worker_cpu = 0.0
+
+    def add_worker_cpu(self, seconds):
+        self._worker_cpu += seconds
+
+    @contextmanager
+    def phase(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._worker_cpu = 0.0
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start + self._worker_cpu
+            self.phases[name] = {
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'parallelism': round(cpu / wall, 2) if wall > 0 else 0.0,
+                'peak_rss_mb': peak_rss_mb(),
+            }
+
+    def report(self):
+        return dict(self.phases)
@@ -0,0 +1,231 @@
+"""Append-only prediction log in SQLite, written by a background thread.
+
+The request path only puts a tuple on a bounded in-memory queue. A single
+writer thread drains the queue and commits up to ``batch_size`` rows per
+transaction (or whatever arrived within ``flush_interval`` seconds) into a
+WAL-mode database, so readers never block the writer.
+
+When the queue is full the ``policy`` decides what happens:
+
+* ``drop``  - the prediction is not logged and ``dropped`` is incremented
+  (the request is never slowed down by the log).
+* ``block`` - the caller waits up to ``block_timeout`` seconds for space and
+  only then drops.
+
+Every batch also updates ``prediction_rollup`` (counts and confidence sums per
+hour, model version and cluster) in the same transaction, so per-cluster
+counts over days or weeks are read from a few hundred rollup rows instead of
+scanning the raw log.
+"""
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+POLICIES = ('drop', 'block')
+BUCKET_SECONDS = 3600
+# UTC windows aligned to the Unix epoch (so weeks start on Thursday)
+WINDOWS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    model_version TEXT,
+    cluster INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    inputs TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts);
+CREATE TABLE IF NOT EXISTS prediction_rollup (
+    bucket INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    cluster INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    PRIMARY KEY (bucket, model_version, cluster)
+);
+"""
+
+_STOP = object()
+
+
+def _connect(path):
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class PredictionLog:
+    """Bounded, batched, asynchronous writer for scored predictions"""
+
+    def __init__(self, path, max_queue=10_000, batch_size=500, flush_interval=1.0,
+                 policy='drop', block_timeout=0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._errors = 0
+        self._last_error = None
+
+    def start(self):
+        """Create the database and start the writer thread (idempotent)"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = _connect(self.path)
+            conn.executescript(_SCHEMA)
+            conn.close()
+            self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def record(self, cluster, confidence, inputs=None, model_version=None, ts=None):
+        """Enqueue one prediction; returns False if it was dropped
+
+        With policy 'block' this can wait up to block_timeout, so async
+        callers should run it in a worker thread.
+        """
+        self.start()
+        item = (ts if ts is not None else time.time(), model_version, int(cluster),
+                float(confidence), json.dumps(inputs) if inputs is not None else None)
+        try:
+            if self.policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            return False
+
+    def _run(self):
+        conn = _connect(self.path)
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                stop = item is _STOP
+                batch = [] if stop else [item]
+                # Drain whatever else is already waiting, up to one batch
+                while not stop and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                    else:
+                        batch.append(item)
+                if batch:
+                    self._write(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        rollup = {}
+        for ts, version, cluster, confidence, _ in batch:
+            key = (int(ts // BUCKET_SECONDS) * BUCKET_SECONDS, version or '', cluster)
+            n, conf_sum = rollup.get(key, (0, 0.0))
+            rollup[key] = (n + 1, conf_sum + confidence)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO predictions (ts, model_version, cluster, confidence, inputs) "
+                    "VALUES (?, ?, ?, ?, ?)", batch
+                )
+                conn.executemany(
+                    "INSERT INTO prediction_rollup (bucket, model_version, cluster, n, confidence_sum) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (bucket, model_version, cluster) DO UPDATE SET "
+                    "n = n + excluded.n, confidence_sum = confidence_sum + excluded.confidence_sum",
+                    [key + value for key, value in rollup.items()]
+                )
+        except sqlite3.Error as e:
+            print(f"⚠️ Prediction log write failed: {e}")
+            with self._stats_lock:
+                self._errors += len(batch)
+                self._last_error = str(e)
+            return
+        with self._stats_lock:
+            self._written += len(batch)
+            self._batches += 1
+
+    def close(self, timeout=10):
+        """Flush everything queued so far and stop the writer"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'path': str(self.path),
+                'policy': self.policy,
+                'queued': self._queue.qsize(),
+                'max_queue': self._queue.maxsize,
+                'written': self._written,
+                'dropped': self._dropped,
+                'failed': self._errors,
+                'batches': self._batches,
+                'avg_batch_size': round(self._written / self._batches, 2) if self._batches else 0.0,
+                'last_error': self._last_error,
+            }
+
+    def rollup(self, window='day', since=None, until=None, model_version=None):
+        """Prediction counts and mean confidence per time window and cluster"""
+        if window not in WINDOWS:
+            raise ValueError(f"window must be one of {sorted(WINDOWS)}, got {window!r}")
+        if not self.path.exists():
+            return []
+        until = until if until is not None else time.time()
+        since = since if since is not None else until - 7 * 86400
+        width = WINDOWS[window]
+
+        query = ("SELECT (bucket / ?) * ? AS window_start, cluster, SUM(n), SUM(confidence_sum) "
+                 "FROM prediction_rollup WHERE bucket >= ? AND bucket < ?")
+        params = [width, width, int(since // BUCKET_SECONDS) * BUCKET_SECONDS, until]
+        if model_version is not None:
+            query += " AND model_version = ?"
+            params.append(model_version)
+        query += " GROUP BY window_start, cluster ORDER BY window_start, cluster"
+
+        conn = _connect(self.path)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {'window_start': _iso(start), 'cluster': cluster, 'count': n,
+             'avg_confidence': round(conf_sum / n, 4)}
+            for start, cluster, n, conf_sum in rows
+        ]
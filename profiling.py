@@ -0,0 +1,182 @@
+"""Opt-in statistical profiling of live requests and training runs.
+
+``SamplingProfiler`` is a pure-Python sampling profiler. A background thread
+wakes every ``interval`` seconds and records the Python stack of every other
+thread via ``sys._current_frames()``, so the profiled code runs unmodified
+(no tracing hooks) and the cost is paid only while a profile is active.
+Threads parked in known idle waits (locks, queues, selectors) are skipped.
+
+Profiles are saved in the collapsed-stack ("folded") format understood by
+``flamegraph.pl``, ``inferno``, and speedscope::
+
+    MainThread;run (uvicorn/main.py:570);predictRouteClient (app_local.py:815) 42
+
+A profiler either samples every thread (``scope`` "process", used for
+training runs) or only a set of thread ids (``scope`` "threads", used for
+requests). A request profile starts with the thread handling the request, and
+worker threads join it for as long as they run that request's work inside
+``profiled_thread()``. The handling thread is the event loop, so other
+coroutines it runs in the same instants still appear.
+
+Only the Python frames of this process are visible: work done inside native
+code is attributed to the Python function that called it, and KMeans
+restarts running in worker processes are not sampled.
+"""
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# (file name, function) of frames where a thread is waiting, not working
+IDLE_LEAVES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'), ('selectors.py', 'select'), ('socket.py', 'accept'),
+    ('connection.py', '_recv'), ('connection.py', 'wait'),
+}
+
+# Profiler of the request being handled in this context, if any
+current_profiler = contextvars.ContextVar('current_profiler', default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = code.co_name.replace(';', ':')
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Sample thread stacks at a fixed interval while running.
+
+    ``threads`` restricts sampling to those thread ids (more can be added
+    while running); None samples every thread in the process.
+    """
+
+    def __init__(self, interval=0.005, include_idle=False, threads=None):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.threads = None if threads is None else set(threads)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def scope(self):
+        return 'process' if self.threads is None else 'threads'
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (self.threads is not None and thread_id not in self.threads):
+                continue
+            leaf = frame.f_code
+            if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}").replace(';', ':'))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.time() - self.started_at
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def folded(self):
+        """Collapsed stacks, heaviest first, one ``stack count`` per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profiled_thread():
+    """Sample the calling thread in the current request's profile while inside"""
+    profiler = current_profiler.get()
+    thread_id = threading.get_ident()
+    if profiler is None or profiler.threads is None or thread_id in profiler.threads:
+        yield
+        return
+    profiler.threads.add(thread_id)
+    try:
+        yield
+    finally:
+        profiler.threads.discard(thread_id)
+
+
+class ProfileStore:
+    """Directory of saved profiles (``<id>.folded`` + ``<id>.json``), newest kept"""
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profiler, kind, label):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}"
+        (self.directory / f"{profile_id}.folded").write_text(profiler.folded())
+        meta = {
+            'id': profile_id,
+            'kind': kind,
+            'label': label,
+            'scope': profiler.scope,
+            'started_at': profiler.started_at,
+            'duration_seconds': round(profiler.duration, 4),
+            'interval_ms': profiler.interval * 1000,
+            'samples': profiler.samples,
+        }
+        with open(self.directory / f"{profile_id}.json", 'w') as f:
+            json.dump(meta, f, indent=2)
+        self._prune()
+        return meta
+
+    def _prune(self):
+        metas = sorted(self.directory.glob("*.json"))
+        for meta_path in metas[:max(0, len(metas) - self.max_profiles)]:
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix(".folded").unlink(missing_ok=True)
+
+    def list(self):
+        """Metadata of saved profiles, newest first"""
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for meta_path in sorted(self.directory.glob("*.json"), reverse=True):
+            with open(meta_path, 'r') as f:
+                profiles.append(json.load(f))
+        return profiles
+
+    def folded_path(self, profile_id):
+        """Path of a saved profile, or None for unknown / malformed ids"""
+        if not profile_id or profile_id.startswith('.') or '/' in profile_id or '\\' in profile_id:
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        return path if path.exists() else None
@@ -0,0 +1,253 @@
+"""Persisted cluster -> customer index with sorted secondary indexes.
+
+Built from the feature store after scoring every customer with the live
+model. Layout (memory-mappable ``.npy`` files)::
+
+    data/segments/
+        current.json                           name of the live build
+        build_<id>/meta.json                   model version, fields, per-cluster counts
+        build_<id>/cluster_<k>/customer_id.npy sorted customer ids in cluster k
+        build_<id>/cluster_<k>/<field>.npy     field values aligned with customer_id.npy
+        build_<id>/cluster_<k>/<field>.order.npy  positions sorted by that field
+        build_<id>/cluster_<k>/<field>.sorted.npy the field values in that order
+
+Every build is written to its own directory and published by replacing
+``current.json`` with ``os.replace``, so a reader always sees a complete
+build. Each query resolves the pointer once and reads only from that build;
+the previous build is kept for queries that were already running.
+
+A query with range filters binary-searches the most selective filter's sorted
+values, so only rows inside that range are visited; the remaining filters
+are checked on those candidates in chunks. ``cursor`` is a position inside
+the candidate range, so each page costs O(log n + rows visited) and never
+scans the whole cluster.
+
+Usage:
+    python segment_index.py build
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from centroid_index import assign_clusters
+
+DEFAULT_INDEX_PATH = Path("data") / "segments"
+SEGMENT_FIELDS = ['Income', 'Recency', 'Total_Spending']
+CHUNK_ROWS = 4096
+
+_publish_lock = threading.Lock()  # rename + pointer swap + cleanup
+
+
+class SegmentIndex:
+    """Read/write access to a persisted segment membership index"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self.pointer_path = self.path / "current.json"
+
+    def _current_dir(self):
+        """Directory of the live build, or None if nothing was published"""
+        try:
+            with open(self.pointer_path, 'r') as f:
+                return self.path / json.load(f)['build']
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_meta(build_dir):
+        with open(build_dir / "meta.json", 'r') as f:
+            return json.load(f)
+
+    def exists(self):
+        return self._current_dir() is not None
+
+    def meta(self):
+        build_dir = self._current_dir()
+        return None if build_dir is None else self._read_meta(build_dir)
+
+    def build(self, customer_ids, clusters, fields, n_clusters, model_version=None):
+        """Write a new index and atomically publish it.
+
+        ``fields`` maps field name -> values aligned with ``customer_ids``.
+        """
+        customer_ids = np.asarray(customer_ids, dtype=np.int64)
+        clusters = np.asarray(clusters)
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f"build_{uuid.uuid4().hex}"
+        tmp_dir = self.path / f".{name}.tmp"
+        tmp_dir.mkdir()
+
+        try:
+            counts = np.bincount(clusters, minlength=n_clusters)
+            for k in range(n_clusters):
+                cluster_dir = tmp_dir / f"cluster_{k}"
+                cluster_dir.mkdir()
+                members = np.flatnonzero(clusters == k)
+                by_id = members[np.argsort(customer_ids[members], kind='stable')]
+                np.save(cluster_dir / "customer_id.npy", customer_ids[by_id])
+                for field, values in fields.items():
+                    values = np.asarray(values, dtype=np.float64)[by_id]
+                    order = np.argsort(values, kind='stable')
+                    np.save(cluster_dir / f"{field}.npy", values)
+                    np.save(cluster_dir / f"{field}.order.npy", order)
+                    np.save(cluster_dir / f"{field}.sorted.npy", values[order])
+
+            with open(tmp_dir / "meta.json", 'w') as f:
+                json.dump({
+                    'model_version': model_version,
+                    'n_rows': int(len(customer_ids)),
+                    'n_clusters': int(n_clusters),
+                    'fields': list(fields),
+                    'cluster_counts': counts.tolist(),
+                }, f, indent=2)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # Publish with a single os.replace of the pointer, so readers see
+        # either the old build or the new one, never a missing or partial one
+        with _publish_lock:
+            os.rename(tmp_dir, self.path / name)
+            previous = self._current_dir()
+            tmp_pointer = self.path / f".current.{uuid.uuid4().hex}.tmp"
+            with open(tmp_pointer, 'w') as f:
+                json.dump({'build': name}, f)
+            os.replace(tmp_pointer, self.pointer_path)
+
+            keep = {name, previous.name if previous is not None else None}
+            for old_dir in self.path.glob("build_*"):
+                if old_dir.name not in keep:
+                    shutil.rmtree(old_dir, ignore_errors=True)
+            # Files from the old single-directory layout
+            (self.path / "meta.json").unlink(missing_ok=True)
+            for old_dir in self.path.glob("cluster_*"):
+                shutil.rmtree(old_dir, ignore_errors=True)
+
+    @staticmethod
+    def _load(build_dir, cluster_id, name):
+        return np.load(build_dir / f"cluster_{cluster_id}" / f"{name}.npy", mmap_mode='r')
+
+    def query(self, cluster_id, filters=None, sort_by=None, cursor=0, limit=100):
+        """One page of customers in ``cluster_id`` matching ``filters``.
+
+        ``filters`` maps field -> (min, max) with ``min <= value < max``; either
+        bound may be None. Results are ordered by ``sort_by`` (a field),
+        otherwise by the most selective filter, otherwise by customer id.
+        Returns ``{'customers': [...], 'next_cursor': int | None, ...}``.
+        """
+        build_dir = self._current_dir()
+        if build_dir is None:
+            raise FileNotFoundError("Segment index has not been built")
+        meta = self._read_meta(build_dir)
+        if not 0 <= cluster_id < meta['n_clusters']:
+            raise ValueError(f"Invalid cluster ID. Must be 0-{meta['n_clusters'] - 1}")
+        filters = {name: bounds for name, bounds in (filters or {}).items()
+                   if bounds[0] is not None or bounds[1] is not None}
+        for name in list(filters) + ([sort_by] if sort_by else []):
+            if name not in meta['fields']:
+                raise ValueError(f"Unknown segment field {name!r}; indexed: {meta['fields']}")
+
+        # Candidate range from each filter's sorted values (two binary searches)
+        ranges = {}
+        for name, (low, high) in filters.items():
+            sorted_values = self._load(build_dir, cluster_id, f"{name}.sorted")
+            start = 0 if low is None else int(np.searchsorted(sorted_values, low, side='left'))
+            stop = len(sorted_values) if high is None else int(np.searchsorted(sorted_values, high, side='left'))
+            ranges[name] = (start, max(start, stop))
+
+        driver = sort_by or (min(ranges, key=lambda n: ranges[n][1] - ranges[n][0]) if ranges else None)
+        if driver is None:
+            order = None
+            start, stop = 0, meta['cluster_counts'][cluster_id]
+        else:
+            order = self._load(build_dir, cluster_id, f"{driver}.order")
+            start, stop = ranges.get(driver, (0, len(order)))
+
+        ids = self._load(build_dir, cluster_id, "customer_id")
+        values = {name: self._load(build_dir, cluster_id, name) for name in meta['fields']}
+        others = {name: bounds for name, bounds in filters.items() if name != driver}
+
+        customers = []
+        position = start + cursor
+        while position < stop and len(customers) < limit:
+            chunk_stop = min(stop, position + max(CHUNK_ROWS, limit))
+            rows = np.arange(position, chunk_stop) if order is None else np.asarray(order[position:chunk_stop])
+            keep = np.ones(len(rows), dtype=bool)
+            for name, (low, high) in others.items():
+                column = values[name][rows]
+                if low is not None:
+                    keep &= column >= low
+                if high is not None:
+                    keep &= column < high
+            matched = np.flatnonzero(keep)[:limit - len(customers)]
+            for i in matched:
+                row = rows[i]
+                customers.append(dict(
+                    {'customer_id': int(ids[row])},
+                    **{name: float(values[name][row]) for name in meta['fields']}
+                ))
+            if len(customers) >= limit:
+                position += int(matched[-1]) + 1
+                break
+            position = chunk_stop
+
+        return {
+            'cluster_id': cluster_id,
+            'model_version': meta['model_version'],
+            'order_by': driver or 'customer_id',
+            'candidates': stop - start,
+            'customers': customers,
+            'next_cursor': position - start if position < stop else None,
+        }
+
+
+def build_from_store(store, model_data, index=None, model_version=None,
+                     fields=SEGMENT_FIELDS, chunk_rows=100_000):
+    """Score every customer in ``store`` with ``model_data`` and index them"""
+    index = index or SegmentIndex()
+    n = len(store)  # one snapshot, even if an ingest appends meanwhile
+    clusters = np.empty(n, dtype=np.int32)
+    columns = model_data['feature_columns']
+    for start in range(0, n, chunk_rows):
+        stop = min(n, start + chunk_rows)
+        X = np.column_stack([store.column(name, n_rows=n)[start:stop] for name in columns])
+        clusters[start:stop], _ = assign_clusters(model_data, model_data['scaler'].transform(X))
+
+    index.build(
+        store.customer_ids(n), clusters,
+        {name: store.column(name, n_rows=n) for name in fields},
+        n_clusters=model_data['optimal_k'], model_version=model_version
+    )
+    return index.meta()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the segment membership index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Score the feature store with the live model and index it")
+    build.add_argument('--store', default=None, help="Feature store path (default data/feature_store)")
+    build.add_argument('--output', default=str(DEFAULT_INDEX_PATH))
+    build.add_argument('--models', default=None, help="Model registry directory (default local_models)")
+    args = parser.parse_args()
+
+    from feature_store import DEFAULT_STORE_PATH, FeatureStore
+    from model_registry import DEFAULT_MODEL_DIR, ModelRegistry
+
+    registry = ModelRegistry(args.models or DEFAULT_MODEL_DIR)
+
+    model_data = registry.get_current()
+    if model_data is None:
+        raise SystemExit("No live model; train one first")
+    meta = build_from_store(FeatureStore(args.store or DEFAULT_STORE_PATH), model_data,
+                            SegmentIndex(args.output), registry.current_version())
+    print(f"✅ Indexed {meta['n_rows']} customers: {meta['cluster_counts']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Train several training configs in parallel and compare time vs quality.
+
+Usage:
+    python sweep_runner.py config/sweep_example.json --n-jobs 4 --output sweep_results.json
+
+Each config file may hold a single config object or a list of them. Runs are
+not saved to the model registry; promote the winner by POSTing its config to
+``/train``.
+"""
+import argparse
+import json
+import time
+
+from joblib import Parallel, delayed
+
+from training import train_model
+from training_config import TrainingConfig
+
+
+def _run_one(config_dict):
+    config = TrainingConfig.from_dict(config_dict)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        _, metrics = train_model(config)
+    except Exception as e:
+        return {'name': config.name, 'config': config_dict, 'error': str(e)}
+
+    return {
+        'name': config.name,
+        'config': config_dict,
+        'wall_seconds': round(time.perf_counter() - wall_start, 3),
+        'cpu_seconds': round(time.process_time() - cpu_start, 3),
+        'optimal_clusters': metrics['optimal_clusters'],
+        'silhouette_score': metrics['silhouette_score'],
+        'silhouette_ci': metrics['silhouette_ci'],
+        'davies_bouldin_score': metrics['davies_bouldin_score'],
+        'calinski_harabasz_score': metrics['calinski_harabasz_score'],
+        'phase_timings': metrics['phase_timings'],
+    }
+
+
+def run_sweep(configs, n_jobs=-1):
+    """Train every config and return results sorted by silhouette (best first).
+
+    Unless a config pins ``n_jobs``/``threads_per_worker`` itself, each run is
+    limited to one worker with one thread so parallel runs don't oversubscribe
+    the machine.
+    """
+    payloads = []
+    for config in configs:
+        data = config.to_dict()
+        if data['n_jobs'] is None:
+            data['n_jobs'] = 1
+        if data['threads_per_worker'] is None:
+            data['threads_per_worker'] = 1
+        payloads.append(data)
+
+    results = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_run_one)(payload) for payload in payloads
+    )
+    return sorted(results, key=lambda r: r.get('silhouette_score', float('-inf')), reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare training configs (time vs silhouette)")
+    parser.add_argument('config_files', nargs='+', help="JSON/YAML files with one or more configs")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Configs trained concurrently")
+    parser.add_argument('--output', default='sweep_results.json', help="Where to write the results")
+    args = parser.parse_args()
+
+    configs = []
+    for path in args.config_files:
+        loaded = TrainingConfig.from_file(path)
+        configs.extend(loaded if isinstance(loaded, list) else [loaded])
+
+    results = run_sweep(configs, n_jobs=args.n_jobs)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'config':<24}{'k':>4}{'wall s':>10}{'silhouette':>12}   95% CI")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['name']:<24}  ❌ {r['error']}")
+            continue
+        lo, hi = r['silhouette_ci']
+        print(f"{r['name']:<24}{r['optimal_clusters']:>4}{r['wall_seconds']:>10.2f}"
+              f"{r['silhouette_score']:>12.4f}   [{lo:.4f}, {hi:.4f}]")
+    print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
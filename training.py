@@ -0,0 +1,397 @@
+"""Model training, independent of the web app.
+
+``train_model(config)`` generates or loads the data, picks k, fits the
+configured algorithm and returns ``(model_data, metrics_summary)`` without
+saving anything; ``app_local.create_advanced_model`` versions and promotes the
+result. Command-line tools (``sweep_runner.py``, ``benchmark_memory.py``) and
+their worker processes import this module instead of ``app_local``, so they do
+not build the FastAPI app, need the ``static``/``templates`` directories or
+run from the repository root.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import RobustScaler, StandardScaler
+
+from centroid_index import build_centroid_index
+from distributed_kmeans import (
+    STATS_COLUMNS, ShardedCluster, fit_distributed, pooled_sample,
+    reduce_cluster_stats, shard_ranges
+)
+from drift_monitor import build_reference
+from evaluation import evaluate_clustering, sampled_silhouette
+from feature_store import ALL_COLUMNS, FeatureStore
+from features import RAW_COLUMNS, RAW_DTYPES, engineer_feature_matrix, engineer_features
+from hierarchical import fit_hierarchical_models
+from parallel_training import PhaseTimer, fit_kmeans_restarts
+from synthetic_data import generate_large
+from training_config import TrainingConfig
+
+
+def _fit_hierarchical(X, cluster_counts, config):
+    """BIRCH / sampled-Ward models for the configured hierarchical algorithm"""
+    return fit_hierarchical_models(
+        X, cluster_counts, config.algorithm,
+        threshold=config.birch_threshold,
+        branching_factor=config.birch_branching_factor,
+        max_subclusters=config.birch_max_subclusters,
+        sample_size=config.hierarchical_sample_size,
+        random_state=config.random_state
+    )
+
+
+def find_optimal_clusters(X, max_clusters=6, timer=None, config=None):
+    """Find optimal number of clusters using Silhouette method (faster)"""
+    if config is None:
+        config = TrainingConfig(max_clusters=max_clusters)
+    silhouette_scores = []
+    
+    # Test fewer clusters for speed; all (k, restart) fits run in parallel
+    cluster_counts = range(config.min_clusters, config.max_clusters + 1)
+    if config.algorithm != 'kmeans':
+        best_models = _fit_hierarchical(X, cluster_counts, config)
+        worker_cpu = 0.0
+    else:
+        best_models, worker_cpu = fit_kmeans_restarts(
+            X, cluster_counts,
+            n_init=config.sweep_n_init,
+            max_iter=config.sweep_max_iter,
+            init=config.init,
+            init_sample_size=config.init_sample_size,
+            random_state=config.random_state,
+            n_jobs=config.n_jobs,
+            threads_per_worker=config.threads_per_worker
+        )
+    if timer is not None:
+        timer.add_worker_cpu(worker_cpu)
+    
+    for n_clusters in cluster_counts:
+        labels = best_models[n_clusters].labels_
+        # Sampled estimate keeps the sweep linear in the number of rows
+        silhouette_scores.append(sampled_silhouette(
+            X, labels,
+            sample_size=config.silhouette_sample_size,
+            n_repeats=1,
+            random_state=config.random_state
+        )['silhouette_score'])
+    
+    # Find best silhouette score
+    best_idx = np.argmax(silhouette_scores)
+    optimal_k = best_idx + config.min_clusters
+    
+    return optimal_k, silhouette_scores
+
+
+def _package_model(config, timer, kmeans, scaler, pca, feature_columns, optimal_k,
+                   cluster_stats, evaluation, drift_reference, n_samples):
+    """Build the model_data dict and metrics summary shared by all engines"""
+    silhouette = evaluation['silhouette_score']
+    davies_bouldin = evaluation['davies_bouldin_score']
+    calinski = evaluation['calinski_harabasz_score']
+    
+    # Save model and metadata
+    model_data = {
+        'kmeans': kmeans,
+        'scaler': scaler,
+        'pca': pca,
+        'feature_columns': feature_columns,
+        'optimal_k': optimal_k,
+        'cluster_stats': cluster_stats,
+        'training_config': config.to_dict(),
+        'drift_reference': drift_reference,
+        # Exact nearest-centroid tree for large k (None = brute force)
+        'centroid_index': build_centroid_index(kmeans.cluster_centers_, config.centroid_index),
+        'metrics': {
+            'silhouette_score': float(silhouette),
+            'davies_bouldin_score': float(davies_bouldin),
+            'calinski_harabasz_score': float(calinski),
+            'silhouette_ci': evaluation['silhouette_ci'],
+            'simplified_silhouette': evaluation['simplified_silhouette'],
+            'inertia': float(kmeans.inertia_)
+        }
+    }
+    
+    metrics_summary = {
+        'optimal_clusters': int(optimal_k),
+        'silhouette_score': float(silhouette),
+        'davies_bouldin_score': float(davies_bouldin),
+        'calinski_harabasz_score': float(calinski),
+        'silhouette_ci': evaluation['silhouette_ci'],
+        'silhouette_sample_size': evaluation['silhouette_sample_size'],
+        'simplified_silhouette': evaluation['simplified_silhouette'],
+        'cluster_sizes': {str(k): int(v['size']) for k, v in cluster_stats.items()},
+        'training_samples': int(n_samples),
+        'features_used': int(len(feature_columns)),
+        'config_name': config.name,
+        'phase_timings': timer.report()
+    }
+    
+    return model_data, metrics_summary
+
+
+def train_model(config=None):
+    """Train a model from ``config`` without persisting it.
+    
+    Returns ``(model_data, metrics_summary)``; used by create_advanced_model
+    and by the config sweep runner.
+    """
+    config = config or TrainingConfig.from_env()
+    timer = PhaseTimer()
+    if config.engine == 'distributed':
+        return _train_distributed(config, timer)
+    
+    np.random.seed(config.random_state)
+    n_samples = config.n_samples
+    
+    if config.feature_store_path:
+        print(f"📦 Loading features from {config.feature_store_path}...")
+        with timer.phase('load_features'):
+            store = FeatureStore(config.feature_store_path)
+            if not store.exists():
+                raise ValueError(f"Feature store {config.feature_store_path} is empty")
+            
+            feature_columns = list(config.feature_columns)
+            missing = [c for c in feature_columns if c not in ALL_COLUMNS]
+            if missing:
+                raise ValueError(f"Unknown feature columns in training config: {missing}")
+            
+            # Only the needed columns are read from the memory-mapped store
+            X = store.load_matrix(feature_columns,
+                                  dtype=np.float32 if config.memory_lean else np.float64)
+            df = store.load_frame(['Age', 'Income', 'Total_Spending'])
+            n_samples = len(X)
+    else:
+        print("📊 Generating training data...")
+        with timer.phase('generate_data'):
+            if config.synthetic_data == 'segments':
+                # Planted segments with correlated spending (synthetic_data.py)
+                df = generate_large(n_samples, seed=config.random_state)[RAW_COLUMNS]
+                if not config.memory_lean:
+                    df = df.astype(np.int64)
+            else:
+                # Generate comprehensive synthetic customer data
+                if config.memory_lean:
+                    # Draw straight into the smallest dtype that fits each column
+                    def randint(name, low, high):
+                        return np.random.randint(low, high, n_samples, dtype=RAW_DTYPES[name])
+                else:
+                    def randint(name, low, high):
+                        return np.random.randint(low, high, n_samples)
+            
+                data = {
+                    'Age': randint('Age', 18, 80),
+                    'Education': randint('Education', 0, 5),
+                    'Marital_Status': randint('Marital_Status', 0, 2),
+                    'Parental_Status': randint('Parental_Status', 0, 2),
+                    'Children': randint('Children', 0, 5),
+                    'Income': randint('Income', 20000, 150000),
+                    'Total_Spending': randint('Total_Spending', 100, 5000),
+                    'Days_as_Customer': randint('Days_as_Customer', 1, 3650),
+                    'Recency': randint('Recency', 0, 100),
+                    'Wines': randint('Wines', 0, 1000),
+                    'Fruits': randint('Fruits', 0, 200),
+                    'Meat': randint('Meat', 0, 800),
+                    'Fish': randint('Fish', 0, 400),
+                    'Sweets': randint('Sweets', 0, 150),
+                    'Gold': randint('Gold', 0, 300),
+                    'Web': randint('Web', 0, 20),
+                    'Catalog': randint('Catalog', 0, 15),
+                    'Store': randint('Store', 0, 25),
+                    'Discount_Purchases': randint('Discount_Purchases', 0, 10),
+                    'Total_Promo': randint('Total_Promo', 0, 6),
+                    'NumWebVisitsMonth': randint('NumWebVisitsMonth', 0, 30),
+                }
+        
+                df = pd.DataFrame(data)
+    
+        with timer.phase('feature_engineering'):
+            # Select important features for clustering
+            feature_columns = list(config.feature_columns)
+            missing = [c for c in feature_columns if c not in ALL_COLUMNS]
+            if missing:
+                raise ValueError(f"Unknown feature columns in training config: {missing}")
+        
+            if config.memory_lean:
+                # Only the selected features, written into one float32 matrix
+                X = engineer_feature_matrix(df, feature_columns, dtype=np.float32)
+            else:
+                X = engineer_features(df)[feature_columns].values
+    
+    with timer.phase('scaling'):
+        # RobustScaler by default (better for outliers)
+        scaler = RobustScaler() if config.scaler == 'robust' else StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+    
+    print("🔍 Finding optimal clusters...")
+    with timer.phase('cluster_sweep'):
+        # Find optimal number of clusters
+        optimal_k, silhouette_scores = find_optimal_clusters(X_scaled, timer=timer, config=config)
+    print(f"✅ Optimal clusters: {optimal_k}")
+    
+    print("🤖 Training KMeans model...")
+    with timer.phase('final_fit'):
+        if config.algorithm != 'kmeans':
+            # Hierarchical modes are deterministic; refit at the chosen k
+            kmeans = _fit_hierarchical(X_scaled, [optimal_k], config)[optimal_k]
+            optimal_k = kmeans.n_clusters
+            kmeans_labels = kmeans.labels_
+        else:
+            # Train primary model (KMeans) - restarts run in parallel worker processes
+            best_models, worker_cpu = fit_kmeans_restarts(
+                X_scaled, [optimal_k],
+                n_init=config.n_init,
+                max_iter=config.max_iter,
+                init=config.init,
+                init_sample_size=config.init_sample_size,
+                random_state=config.random_state,
+                n_jobs=config.n_jobs,
+                threads_per_worker=config.threads_per_worker
+            )
+            timer.add_worker_cpu(worker_cpu)
+            kmeans = best_models[optimal_k]
+            kmeans_labels = kmeans.labels_
+    
+    print("📊 Calculating metrics...")
+    with timer.phase('evaluation'):
+        # Calculate metrics (sampled silhouette + streaming DB/CH, linear in n)
+        evaluation = evaluate_clustering(
+            X_scaled, kmeans_labels, optimal_k,
+            silhouette_sample_size=config.silhouette_sample_size,
+            n_repeats=config.silhouette_repeats,
+            random_state=config.random_state
+        )
+    
+    print("🔬 Applying PCA...")
+    with timer.phase('pca'):
+        # Apply PCA for visualization
+        pca = PCA(n_components=3)
+        X_pca = pca.fit_transform(X_scaled)
+    
+    print("📈 Calculating cluster statistics...")
+    with timer.phase('cluster_statistics'):
+        # Calculate cluster statistics
+        cluster_stats = {}
+        for i in range(optimal_k):
+            cluster_mask = kmeans_labels == i
+            cluster_stats[i] = {
+                'size': int(np.sum(cluster_mask)),
+                'avg_income': float(df[cluster_mask]['Income'].mean()),
+                'avg_spending': float(df[cluster_mask]['Total_Spending'].mean()),
+                'avg_age': float(df[cluster_mask]['Age'].mean()),
+            }
+    
+    with timer.phase('drift_reference'):
+        # Histogram sketch of the training inputs for drift monitoring
+        drift_reference = build_reference(X, feature_columns, kmeans_labels, optimal_k)
+    
+    return _package_model(
+        config, timer, kmeans, scaler, pca, feature_columns, optimal_k,
+        cluster_stats, evaluation, drift_reference, n_samples
+    )
+
+
+def _train_distributed(config, timer):
+    """Train with map-reduce Lloyd iterations over feature-store shards.
+    
+    The coordinator only ever holds a pooled sample (for scaling, seeding,
+    silhouette, PCA and the drift reference); everything else is reduced
+    from per-shard statistics computed inside the workers.
+    """
+    store = FeatureStore(config.feature_store_path)
+    if not store.exists():
+        raise ValueError(f"Feature store {config.feature_store_path} is empty")
+    feature_columns = list(config.feature_columns)
+    missing = [c for c in feature_columns if c not in ALL_COLUMNS]
+    if missing:
+        raise ValueError(f"Unknown feature columns in training config: {missing}")
+    n_samples = len(store)
+    
+    if config.worker_addresses:
+        cluster = ShardedCluster.connect(config.worker_addresses)
+    else:
+        cluster = ShardedCluster.start_local(
+            config.distributed_workers, threads_per_worker=config.threads_per_worker or 1
+        )
+    
+    with cluster:
+        print(f"📦 Loading {n_samples} customers into {len(cluster)} shards...")
+        with timer.phase('load_shards'):
+            shard_sizes = cluster.call_each('load_store', [
+                (config.feature_store_path, feature_columns, start, stop)
+                for start, stop in shard_ranges(n_samples, len(cluster))
+            ])
+            sample_size = max(config.init_sample_size, config.silhouette_sample_size)
+            sample_raw = pooled_sample(cluster, shard_sizes, sample_size, config.random_state)
+        
+        with timer.phase('scaling'):
+            # Scaler is fitted on the pooled sample, then applied inside each shard
+            scaler = RobustScaler() if config.scaler == 'robust' else StandardScaler()
+            sample = scaler.fit_transform(sample_raw)
+            center = getattr(scaler, 'center_', None)
+            if center is None:
+                center = scaler.mean_
+            cluster.call_all('set_scaler', center, scaler.scale_)
+        
+        print("🔍 Finding optimal clusters...")
+        with timer.phase('cluster_sweep'):
+            silhouette_scores = []
+            for n_clusters in range(config.min_clusters, config.max_clusters + 1):
+                candidate = fit_distributed(
+                    cluster, n_clusters, sample,
+                    n_init=config.sweep_n_init, max_iter=config.sweep_max_iter,
+                    tol=config.lloyd_tol, random_state=config.random_state
+                )
+                silhouette_scores.append(sampled_silhouette(
+                    sample, candidate.predict(sample),
+                    sample_size=config.silhouette_sample_size, n_repeats=1,
+                    random_state=config.random_state
+                )['silhouette_score'])
+            optimal_k = int(np.argmax(silhouette_scores)) + config.min_clusters
+        print(f"✅ Optimal clusters: {optimal_k}")
+        
+        print("🤖 Training distributed KMeans model...")
+        with timer.phase('final_fit'):
+            kmeans = fit_distributed(
+                cluster, optimal_k, sample,
+                n_init=config.n_init, max_iter=config.max_iter,
+                tol=config.lloyd_tol, random_state=config.random_state
+            )
+        
+        print("📊 Calculating metrics...")
+        with timer.phase('evaluation'):
+            acc, raw_means = reduce_cluster_stats(cluster, kmeans.cluster_centers_)
+            sample_labels = kmeans.predict(sample)
+            evaluation = sampled_silhouette(
+                sample, sample_labels,
+                sample_size=config.silhouette_sample_size,
+                n_repeats=config.silhouette_repeats,
+                random_state=config.random_state
+            )
+            evaluation.update({
+                'simplified_silhouette': float(acc.simplified_silhouette()),
+                'davies_bouldin_score': float(acc.davies_bouldin()),
+                'calinski_harabasz_score': float(acc.calinski_harabasz()),
+            })
+    
+    print("🔬 Applying PCA...")
+    with timer.phase('pca'):
+        pca = PCA(n_components=3)
+        pca.fit(sample)
+    
+    with timer.phase('cluster_statistics'):
+        cluster_stats = {}
+        for i in range(optimal_k):
+            cluster_stats[i] = {
+                'size': int(acc.counts[i]),
+                'avg_income': float(raw_means[i][STATS_COLUMNS.index('Income')]),
+                'avg_spending': float(raw_means[i][STATS_COLUMNS.index('Total_Spending')]),
+                'avg_age': float(raw_means[i][STATS_COLUMNS.index('Age')]),
+            }
+    
+    with timer.phase('drift_reference'):
+        drift_reference = build_reference(sample_raw, feature_columns, sample_labels, optimal_k)
+    
+    return _package_model(
+        config, timer, kmeans, scaler, pca, feature_columns, optimal_k,
+        cluster_stats, evaluation, drift_reference, n_samples
+    )
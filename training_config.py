@@ -0,0 +1,162 @@
+"""Declarative training configuration.
+
+Everything that trades training speed against model quality lives here
+instead of being hard-coded in ``create_advanced_model``. A config can be
+built in code, loaded from a JSON/YAML file, or posted as JSON to ``/train``;
+the config used for a run is saved next to the model version.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+from typing import List, Optional
+
+DEFAULT_FEATURE_COLUMNS = [
+    'Age', 'Income', 'Total_Spending', 'Days_as_Customer', 'Recency',
+    'Total_Product_Spending', 'Total_Purchases', 'Online_Ratio',
+    'Purchase_Frequency', 'Avg_Purchase_Value', 'Promo_Acceptance_Rate',
+    'Discount_Ratio', 'Customer_Lifetime_Value', 'Income_to_Spending_Ratio',
+    'Premium_Product_Ratio', 'Web_Engagement'
+]
+
+SCALERS = ('robust', 'standard')
+ENGINES = ('local', 'distributed')
+ALGORITHMS = ('kmeans', 'birch', 'hierarchical')
+CENTROID_INDEXES = ('none', 'auto', 'kd_tree', 'ball_tree')
+SYNTHETIC_DATA = ('uniform', 'segments')
+# Keys accepted only from the server-side config file, never from POST /train
+SERVER_SIDE_KEYS = ('engine', 'worker_addresses')
+
+
+@dataclass
+class TrainingConfig:
+    """Parameters for one training run.
+
+    Defaults keep the original data, features and clustering search, but use
+    the memory-lean data path (compact dtypes, float32 features); set
+    ``memory_lean=False`` for the original float64 pipeline.
+    """
+
+    name: str = "default"
+    n_samples: int = 1000
+    random_state: int = 42
+    # Train on customers from this feature store instead of synthetic data
+    feature_store_path: Optional[str] = None
+    # Synthetic data: "uniform" independent columns (original), or "segments"
+    # (planted segments from synthetic_data.py)
+    synthetic_data: str = "uniform"
+    feature_columns: List[str] = field(default_factory=lambda: list(DEFAULT_FEATURE_COLUMNS))
+    scaler: str = "robust"
+    # Compact raw dtypes + float32 feature matrix built without a copied frame
+    memory_lean: bool = True
+
+    # Cluster sweep
+    min_clusters: int = 2
+    max_clusters: int = 6
+    sweep_n_init: int = 5
+    sweep_max_iter: int = 100
+
+    # "kmeans", or a near-linear hierarchical mode: "birch" (CF-tree) or
+    # "hierarchical" (Ward on a sample, then nearest-centroid assignment)
+    algorithm: str = "kmeans"
+    birch_threshold: float = 2.0
+    birch_branching_factor: int = 50
+    birch_max_subclusters: int = 2000
+    hierarchical_sample_size: int = 3000
+
+    # Final fit
+    n_init: int = 10
+    max_iter: int = 300
+    init: str = "k-means++"
+    init_sample_size: int = 10_000
+
+    # Parallelism (None = TRAINING_N_JOBS / TRAINING_THREADS_PER_WORKER or auto)
+    n_jobs: Optional[int] = None
+    threads_per_worker: Optional[int] = None
+
+    # Nearest-centroid search index saved with the model: "auto" builds a
+    # KD-tree chosen per call by batch size and k, or force "kd_tree" / "ball_tree" / "none"
+    centroid_index: str = "auto"
+
+    # Evaluation
+    silhouette_sample_size: int = 2000
+    silhouette_repeats: int = 5
+
+    # "local" trains in this process; "distributed" shards the feature store
+    # across worker processes (worker_addresses, or distributed_workers local ones)
+    engine: str = "local"
+    distributed_workers: int = 4
+    worker_addresses: List[str] = field(default_factory=list)
+    lloyd_tol: float = 1e-4
+
+    def __post_init__(self):
+        if self.engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, got {self.engine!r}")
+        if self.engine == 'distributed' and not self.feature_store_path:
+            raise ValueError("The distributed engine trains from a feature store; set feature_store_path")
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"algorithm must be one of {ALGORITHMS}, got {self.algorithm!r}")
+        if self.engine == 'distributed' and self.algorithm != 'kmeans':
+            raise ValueError("The distributed engine only supports algorithm='kmeans'")
+        if self.synthetic_data not in SYNTHETIC_DATA:
+            raise ValueError(f"synthetic_data must be one of {SYNTHETIC_DATA}, got {self.synthetic_data!r}")
+        if self.centroid_index not in CENTROID_INDEXES:
+            raise ValueError(f"centroid_index must be one of {CENTROID_INDEXES}, got {self.centroid_index!r}")
+        if self.scaler not in SCALERS:
+            raise ValueError(f"scaler must be one of {SCALERS}, got {self.scaler!r}")
+        if not 2 <= self.min_clusters <= self.max_clusters:
+            raise ValueError("Require 2 <= min_clusters <= max_clusters")
+        if self.n_samples <= self.max_clusters:
+            raise ValueError("n_samples must be larger than max_clusters")
+        if not self.feature_columns:
+            raise ValueError("feature_columns must not be empty")
+        for name in ('n_init', 'max_iter', 'sweep_n_init', 'sweep_max_iter',
+                     'init_sample_size', 'silhouette_sample_size', 'silhouette_repeats'):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be positive")
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown training config keys: {sorted(unknown)}")
+        return cls(**data)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a config (or a list of configs) from a .json/.yaml file"""
+        data = load_config_file(path)
+        if isinstance(data, list):
+            return [cls.from_dict(item) for item in data]
+        return cls.from_dict(data)
+
+    @classmethod
+    def from_env(cls):
+        """Config from the file named by TRAINING_CONFIG, else the defaults"""
+        path = os.getenv("TRAINING_CONFIG")
+        if not path:
+            return cls()
+        config = cls.from_file(path)
+        if isinstance(config, list):
+            raise ValueError(f"TRAINING_CONFIG {path} must contain a single config")
+        return config
+
+    def to_dict(self):
+        return asdict(self)
+
+    def replace(self, **overrides):
+        return type(self).from_dict({**self.to_dict(), **overrides})
+
+
+def load_config_file(path):
+    path = Path(path)
+    with open(path, 'r') as f:
+        if path.suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("PyYAML is required for YAML training configs "
+                                  "(pip install pyyaml), or use JSON") from e
+            return yaml.safe_load(f)
+        return json.load(f)
@@ -0,0 +1,157 @@
+"""Single-flight guard for model training.
+
+Only one training run may happen at a time, both across threads of a worker
+and across worker processes sharing the same ``local_models`` directory
+(enforced with an OS file lock). Other callers either wait for the running
+job and reuse its result, or fail fast with ``TrainingInProgress``.
+
+The leader writes its pid into the lock file while it holds the lock and
+clears it before releasing, so ``is_running`` can report a leader in another
+process by reading the file, without ever taking the lock itself (a probe
+that briefly held the lock made a concurrent ``/train`` fail spuriously).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class TrainingInProgress(Exception):
+    """Raised when a caller gives up waiting for another training run"""
+
+    def __init__(self, message="Model training is in progress", retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _try_lock_file(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, owned by another user
+        return True
+    return True
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SingleFlight:
+    """Let exactly one caller run a job while the others wait or bail out"""
+
+    def __init__(self, lock_path, poll_interval=0.05, retry_after=5):
+        self.lock_path = Path(lock_path)
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def _remaining(deadline):
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    @contextmanager
+    def _file_lock(self, deadline):
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a+') as f:
+            while not _try_lock_file(f):
+                remaining = self._remaining(deadline)
+                if remaining is not None and remaining <= 0:
+                    raise TrainingInProgress(
+                        "Model training is running in another worker",
+                        retry_after=self.retry_after
+                    )
+                time.sleep(min(self.poll_interval, remaining or self.poll_interval))
+            try:
+                f.seek(0)
+                f.truncate()
+                f.write(str(os.getpid()))
+                f.flush()
+                yield
+            finally:
+                f.seek(0)
+                f.truncate()
+                f.flush()
+                _unlock_file(f)
+
+    def run(self, work, ready=None, timeout=None):
+        """Run ``work()`` as the single leader, or wait for the current leader.
+
+        ``ready`` is checked before doing any work (and again once the
+        cross-process lock is held); if it returns something other than None
+        that value is returned instead, so waiters reuse the leader's result.
+        ``timeout`` is the maximum wait in seconds: None waits forever and 0
+        fails immediately when another run is active.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if timeout == 0:
+            acquired = self._thread_lock.acquire(blocking=False)
+        elif deadline is None:
+            acquired = self._thread_lock.acquire()
+        else:
+            acquired = self._thread_lock.acquire(timeout=self._remaining(deadline))
+        if not acquired:
+            raise TrainingInProgress(retry_after=self.retry_after)
+
+        try:
+            if ready is not None:
+                result = ready()
+                if result is not None:
+                    return result
+
+            with self._file_lock(deadline):
+                if ready is not None:
+                    result = ready()
+                    if result is not None:
+                        return result
+
+                return work()
+        finally:
+            self._thread_lock.release()
+
+    def is_running(self):
+        """True if a training run holds the lock in this or another process"""
+        if self._thread_lock.locked():
+            return True
+        if not self.lock_path.exists():
+            return False
+        if fcntl is None:
+            # No portable liveness check on Windows; probe the lock instead
+            with open(self.lock_path, 'a+') as f:
+                if _try_lock_file(f):
+                    _unlock_file(f)
+                    return False
+                return True
+        try:
+            pid = int(self.lock_path.read_text().strip() or 0)
+        except (OSError, ValueError):
+            return False
+        # A pid left behind by a crashed leader belongs to a dead process
+        return pid > 0 and _pid_alive(pid)